@@ -0,0 +1,28 @@
+"""
+ASGI config for forum_project project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+The read-heavy forum pages are served by async views unless
+``FORUMS_ASYNC_VIEWS`` is set to ``False``.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "forum_project.settings")
+os.environ.setdefault("FORUMS_ASYNC_VIEWS", "True")
+# Connections opened by async requests are not reused, so keep none open.
+os.environ.setdefault("CONN_MAX_AGE", "0")
+
+application = get_asgi_application()
+
+from django.conf import settings  # noqa: E402
+
+if getattr(settings, "FORUMS_PREWARM_TEMPLATES", False):
+    from .templating import warm_templates
+
+    warm_templates()
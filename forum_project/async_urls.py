@@ -0,0 +1,20 @@
+"""
+URL configuration that serves the board list, topic list and thread pages,
+and the thread event stream, from the async views in ``forums.async_views``.
+Every other URL is the same as in ``forum_project.urls``.
+
+Selected with ``FORUMS_ASYNC_VIEWS=True``, which ``forum_project.asgi`` sets
+by default.
+"""
+from django.urls import path
+
+from forums import async_views
+
+from . import urls
+
+urlpatterns = [
+    path('', async_views.BoardListView.as_view(), name='home'),
+    path('boards/<int:pk>/', async_views.TopicListView.as_view(), name='board_topics'),
+    path('boards/<int:pk>/<int:topic_pk>/', async_views.PostListView.as_view(), name='topic_posts'),
+    path('boards/<int:pk>/<int:topic_pk>/events/', async_views.topic_events, name='topic_events'),
+] + urls.urlpatterns
@@ -0,0 +1,39 @@
+"""
+Production settings: everything in settings.py, with debugging off and
+templates compiled once per process.
+
+Select with DJANGO_SETTINGS_MODULE=forum_project.production_settings.
+SECRET_KEY and ALLOWED_HOSTS (comma-separated) must be set in the
+environment; there is no fallback to the development values. Background
+tasks go to the database for the Procfile's worker unless
+FORUMS_TASK_BROKER says otherwise.
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .settings import *  # noqa: F401,F403
+from .settings import FORUMS_TASKS, TASK_BROKERS, TEMPLATES
+from .templating import cached_templates
+
+
+def require_env(name):
+    value = os.environ.get(name, '').strip()
+    if not value:
+        raise ImproperlyConfigured(f'The {name} environment variable must be set in production.')
+    return value
+
+
+DEBUG = False
+
+SECRET_KEY = require_env('SECRET_KEY')
+ALLOWED_HOSTS = require_env('ALLOWED_HOSTS').split(',')
+
+TEMPLATES = cached_templates(TEMPLATES)
+
+# Sending mail and indexing posts happen in the worker, after the response.
+FORUMS_TASKS = {**FORUMS_TASKS, 'BROKER': TASK_BROKERS[os.environ.get('FORUMS_TASK_BROKER', 'database')]}
+
+# Compile everything under templates/ when a worker boots, see
+# forum_project/templating.py.
+FORUMS_PREWARM_TEMPLATES = True
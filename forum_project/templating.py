@@ -0,0 +1,60 @@
+import logging
+import os
+
+from django.template import TemplateDoesNotExist, TemplateSyntaxError, engines
+
+logger = logging.getLogger(__name__)
+
+
+def cached_templates(templates):
+    """
+    ``templates`` (a TEMPLATES setting) with the loaders wrapped in the cached
+    loader, which keeps every compiled template for the life of the process.
+    The debug context processor only adds anything with DEBUG on, so it is
+    dropped; the admin needs the other three.
+    """
+    return [
+        {
+            **templates[0],
+            'APP_DIRS': False,
+            'OPTIONS': {
+                'context_processors': [
+                    'django.template.context_processors.request',
+                    'django.contrib.auth.context_processors.auth',
+                    'django.contrib.messages.context_processors.messages',
+                ],
+                'loaders': [
+                    ('django.template.loaders.cached.Loader', [
+                        'django.template.loaders.filesystem.Loader',
+                        'django.template.loaders.app_directories.Loader',
+                    ]),
+                ],
+            },
+        },
+    ]
+
+
+def template_names(directory):
+    for root, dirs, files in os.walk(directory):
+        for filename in files:
+            if filename.endswith(('.html', '.txt')):
+                yield os.path.relpath(os.path.join(root, filename), directory).replace(os.sep, '/')
+
+
+def warm_templates():
+    """
+    Load every template in the project's template directories so that a
+    cached loader has them compiled before the first request. Returns the
+    number of templates loaded.
+    """
+    loaded = 0
+    for engine in engines.all():
+        for directory in engine.dirs:
+            for name in template_names(directory):
+                try:
+                    engine.get_template(name)
+                except (TemplateDoesNotExist, TemplateSyntaxError):
+                    logger.exception('Could not pre-compile template %s', name)
+                else:
+                    loaded += 1
+    return loaded
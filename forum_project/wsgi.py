@@ -14,3 +14,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "forum_project.settings")
 
 application = get_wsgi_application()
+
+from django.conf import settings  # noqa: E402
+
+if getattr(settings, "FORUMS_PREWARM_TEMPLATES", False):
+    from .templating import warm_templates
+
+    warm_templates()
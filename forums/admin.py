@@ -1,5 +1,140 @@
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
+from django.db.models import QuerySet
+from django.db.models.functions import Substr
 
+from . import caching, moderation
 from .models import Board, Topic, Post
+from .pagination import EstimatedCountPaginator
 
-admin.site.register((Board, Topic, Post))
+
+class BulkDeleteMixin:
+    """
+    Delete through ``forums.moderation`` instead of one object at a time, and
+    confirm with counts instead of listing every related object.
+    """
+    confirmation_limit = 100
+
+    def related_counts(self, objs):
+        """How many related rows go with ``objs``, by model."""
+        return {}
+
+    def bulk_delete(self, queryset):
+        raise NotImplementedError('subclasses of BulkDeleteMixin must provide bulk_delete()')
+
+    def get_deleted_objects(self, objs, request):
+        total = objs.count() if isinstance(objs, QuerySet) else len(objs)
+        counts = {self.model: total, **self.related_counts(objs)}
+        perms_needed = {
+            model._meta.verbose_name for model in counts
+            if not request.user.has_perm(f'{model._meta.app_label}.delete_{model._meta.model_name}')
+        }
+        deleted_objects = [str(obj) for obj in objs[:self.confirmation_limit]]
+        if total > self.confirmation_limit:
+            deleted_objects.append(f'… and {total - self.confirmation_limit} more')
+        model_count = {model._meta.verbose_name_plural: count for model, count in counts.items() if count}
+        return deleted_objects, model_count, perms_needed, []
+
+    def delete_model(self, request, obj):
+        self.bulk_delete(self.model.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        self.bulk_delete(queryset)
+
+
+class FixedParentMixin:
+    """
+    Show ``parent_field`` read-only once the object exists. Saving a form
+    updates no counters, search index or page caches, so objects are moved
+    with the ``move_topics`` and ``merge_topics`` commands instead.
+    """
+    parent_field = None
+
+    def get_readonly_fields(self, request, obj=None):
+        readonly_fields = super().get_readonly_fields(request, obj)
+        return readonly_fields if obj is None else (*readonly_fields, self.parent_field)
+
+
+class BoardAdmin(BulkDeleteMixin, admin.ModelAdmin):
+    list_display = ('name', 'description', 'topics_count', 'posts_count')
+    readonly_fields = ('topics_count', 'posts_count')
+    raw_id_fields = ('last_post',)
+    actions = ['refresh_counters']
+
+    def related_counts(self, objs):
+        return {
+            Topic: Topic.objects.filter(board__in=objs).count(),
+            Post: Post.objects.filter(topic__board__in=objs).count(),
+        }
+
+    def bulk_delete(self, queryset):
+        moderation.delete_topics(Topic.objects.filter(board__in=queryset))
+        queryset.delete()
+
+    @admin.action(description='Recount posts and topics')
+    def refresh_counters(self, request, queryset):
+        count = queryset.refresh_counters()
+        caching.bump('boards', *(f'board:{pk}' for pk in queryset.values_list('pk', flat=True)))
+        self.message_user(request, f'Recounted {count} boards.')
+
+
+class TopicAdmin(FixedParentMixin, BulkDeleteMixin, admin.ModelAdmin):
+    list_display = ('subject', 'board', 'starter', 'last_updated', 'reply_count', 'views')
+    list_select_related = ('board', 'starter')
+    # Served by the (board, last_updated, id) index.
+    list_filter = ('board',)
+    raw_id_fields = ('starter', 'last_poster')
+    readonly_fields = ('reply_count', 'views')
+    parent_field = 'board'
+    ordering = ('-pk',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ['refresh_counters']
+
+    def related_counts(self, objs):
+        return {Post: Post.objects.filter(topic__in=objs).count()}
+
+    def bulk_delete(self, queryset):
+        moderation.delete_topics(queryset)
+
+    @admin.action(description='Recount replies and last activity')
+    def refresh_counters(self, request, queryset):
+        count = queryset.refresh_counters()
+        for pk, board_id in queryset.values_list('pk', 'board'):
+            caching.bump(f'board:{board_id}', f'topic:{pk}')
+        caching.bump('boards')
+        self.message_user(request, f'Recounted {count} topics.')
+
+
+class PostChangeList(ChangeList):
+    def get_results(self, request):
+        # Read the start of each message for the list instead of the whole of it.
+        self.queryset = self.queryset.annotate(excerpt=Substr('message', 1, 80)).defer('message')
+        super().get_results(request)
+
+
+class PostAdmin(FixedParentMixin, BulkDeleteMixin, admin.ModelAdmin):
+    list_display = ('pk', 'excerpt', 'topic', 'created_by', 'created_at')
+    list_select_related = ('topic', 'created_by')
+    raw_id_fields = ('topic', 'created_by', 'updated_by')
+    parent_field = 'topic'
+    ordering = ('-pk',)
+    # Sorting by anything but the primary key would sort the whole table.
+    sortable_by = ('pk',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_changelist(self, request, **kwargs):
+        return PostChangeList
+
+    @admin.display(description='message')
+    def excerpt(self, post):
+        return post.excerpt
+
+    def bulk_delete(self, queryset):
+        moderation.delete_posts(queryset)
+
+
+admin.site.register(Board, BoardAdmin)
+admin.site.register(Topic, TopicAdmin)
+admin.site.register(Post, PostAdmin)
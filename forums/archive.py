@@ -0,0 +1,140 @@
+"""
+Cold storage for old topics.
+
+``archive_topics`` moves topics without activity for ``INACTIVE_DAYS`` out of
+the topic and post tables into ``ArchivedTopic`` and ``ArchivedPost``, with
+the messages zlib-compressed. Add an ``archive`` entry to
+``settings.DATABASES`` to keep them in a database of their own; otherwise
+they stay in ``default``. The thread page falls back to the archive for a
+topic that is no longer in the hot tables, so links keep working.
+Archived topics are read-only and drop out of the board's topic list and
+of search.
+
+Each batch is copied to the archive before it is deleted from the hot
+tables. An interrupted run leaves copies of some topics in both, and the
+next run finishes moving them.
+
+Board and user post counts keep including archived posts. ``refresh_counters``
+adds them back with ``add_archived_counts``.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Case, Count, F, OuterRef, Subquery, Value, When
+from django.utils import timezone
+
+from . import caching, search
+from .models import ArchivedPost, ArchivedTopic, Board, Post, Topic, TopicReadState
+from .moderation import pk_batches, raw_delete
+from .routers import archive_alias
+
+DEFAULTS = {
+    'INACTIVE_DAYS': 365,
+    'BATCH_SIZE': 100,
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'FORUMS_ARCHIVE', {})}
+
+
+def candidates(inactive_days=None):
+    days = get_config()['INACTIVE_DAYS'] if inactive_days is None else inactive_days
+    return Topic.objects.filter(last_updated__lt=timezone.now() - timedelta(days=days))
+
+
+def copy_to_archive(pks):
+    topics = [
+        ArchivedTopic(
+            id=topic.pk, subject=topic.subject, board_id=topic.board_id, starter_id=topic.starter_id,
+            last_updated=topic.last_updated, views=topic.views, reply_count=topic.reply_count,
+        )
+        for topic in Topic.objects.filter(pk__in=pks)
+    ]
+    posts = [
+        ArchivedPost(
+            id=post.pk, topic_id=post.topic_id, message=post.message, created_at=post.created_at,
+            updated_at=post.updated_at, created_by_id=post.created_by_id, updated_by_id=post.updated_by_id,
+        )
+        for post in Post.objects.filter(topic__in=pks).defer('message_html')
+    ]
+    with transaction.atomic(using=archive_alias()):
+        # Rows copied by an interrupted run are already there.
+        ArchivedTopic.objects.bulk_create(topics, ignore_conflicts=True)
+        ArchivedPost.objects.bulk_create(posts, ignore_conflicts=True)
+    return [post.pk for post in posts]
+
+
+def archive_topics(inactive_days=None, batch_size=None, log=None):
+    """Move inactive topics and their posts to the archive. Returns the number of topics moved."""
+    log = log or (lambda message: None)
+    batch_size = batch_size or get_config()['BATCH_SIZE']
+    archived = 0
+    board_ids = set()
+    for pks in pk_batches(candidates(inactive_days), batch_size):
+        post_pks = copy_to_archive(pks)
+        with transaction.atomic():
+            board_ids.update(Topic.objects.filter(pk__in=pks).values_list('board', flat=True))
+            Board.objects.filter(last_post__topic__in=pks).update(last_post=None)
+            raw_delete(Post.objects.filter(topic__in=pks))
+            raw_delete(TopicReadState.objects.filter(topic__in=pks))
+            raw_delete(Topic.objects.filter(pk__in=pks))
+            backend = search.get_backend()
+            backend.remove_posts(post_pks)
+            backend.remove_topics(pks)
+        caching.bump(*(f'topic:{pk}' for pk in pks))
+        archived += len(pks)
+        log(f'Archived {archived} topics.')
+    # The counts still include the archived posts; only the latest post may have moved.
+    latest = Post.objects.filter(topic__board=OuterRef('pk')).order_by('-created_at', '-pk')
+    Board.objects.filter(pk__in=board_ids, last_post=None).update(last_post=Subquery(latest.values('pk')[:1]))
+    caching.bump('boards', *(f'board:{pk}' for pk in board_ids))
+    return archived
+
+
+def add_counts(queryset, field, counts, batch_size=500):
+    """Add ``counts``, a dict of amounts by pk, to ``field`` of the rows in ``queryset``."""
+    counts = list(counts.items())
+    for start in range(0, len(counts), batch_size):
+        batch = dict(counts[start:start + batch_size])
+        queryset.filter(pk__in=batch).update(**{
+            field: F(field) + Case(*(When(pk=pk, then=Value(count)) for pk, count in batch.items()), default=0),
+        })
+
+
+def add_archived_counts(queryset):
+    """Add the archived topics and posts to counters just recounted from the hot tables."""
+    if queryset.model is Board:
+        add_counts(queryset, 'topics_count', dict(
+            ArchivedTopic.objects.values_list('board_id').annotate(count=Count('pk')).order_by()
+        ))
+        posts = ArchivedPost.objects.values_list('topic__board_id').annotate(count=Count('pk')).order_by()
+        add_counts(queryset, 'posts_count', dict(posts))
+    elif queryset.model is get_user_model():
+        # Users are many, so only count the archived posts of the users in ``queryset``.
+        user_pks = list(queryset.values_list('pk', flat=True))
+        for start in range(0, len(user_pks), 500):
+            posts = ArchivedPost.objects.filter(created_by_id__in=user_pks[start:start + 500])
+            add_counts(queryset, 'post_count', dict(
+                posts.values_list('created_by_id').annotate(count=Count('pk')).order_by()
+            ))
+
+
+def get_topic(board_pk, topic_pk):
+    """The archived topic with its board, or None."""
+    board = Board.objects.filter(pk=board_pk).first()
+    topic = ArchivedTopic.objects.filter(board_id=board_pk, pk=topic_pk).first()
+    if board is None or topic is None:
+        return None
+    topic.board = board
+    return topic
+
+
+def attach_authors(posts):
+    """Set ``created_by`` on archived posts, which only store the user's id."""
+    users = get_user_model().objects.in_bulk({post.created_by_id for post in posts})
+    for post in posts:
+        post.created_by = users.get(post.created_by_id)
+    return posts
@@ -0,0 +1,106 @@
+"""
+Async fronts for the read-heavy pages, routed by ``forum_project.async_urls``.
+
+Each one serves a view from ``views.py``. Conditional GETs and anonymous
+visitors with a cached copy are answered on the event loop, without a
+thread or a query. A page that has to be built runs the sync view's own
+queries, pagination and template in a thread through ``sync_to_async``, so
+both URL configurations render the same thing from the same code.
+"""
+from contextlib import nullcontext
+
+from asgiref.sync import sync_to_async
+from django.http import Http404
+from django.views import View
+from django.views.generic.list import BaseListView
+
+from . import events, views
+from .caching import cached_page, conditional_response, finish_response, page_key, store_page
+from .instrumentation import render
+from .models import ArchivedTopic, Topic
+from .replicas import use_primary, using_replica
+from .view_counter import arecord_view
+
+
+async def aget_object_or_404(queryset, **kwargs):
+    try:
+        return await queryset.aget(**kwargs)
+    except queryset.model.DoesNotExist:
+        raise Http404(f'No {queryset.model._meta.object_name} matches the given query.')
+
+
+class AsyncPageView(View):
+    """
+    Async counterpart of ConditionalGetMixin and AnonymousCacheMixin for
+    ``page_view``, a ListView from ``views.py`` that uses them.
+    """
+    page_view = None
+
+    async def get(self, request, *args, **kwargs):
+        # The user is loaded from the session on first access, which queries the database.
+        authenticated = await sync_to_async(lambda: request.user.is_authenticated)()
+        self.page = self.page_view()
+        self.page.setup(request, *args, **kwargs)
+        scopes = self.page.get_cache_scopes()
+        etag, response = conditional_response(request, scopes)
+        if response is None:
+            # The page cache lives in process memory or on local disk, so it is
+            # called directly rather than through a thread.
+            key = None if authenticated else page_key(request, scopes)
+            response = cached_page(key) if key else None
+            if response is None:
+                response = await sync_to_async(self.render_page)(bool(key), request, *args, **kwargs)
+                if key:
+                    store_page(key, response)
+                elif using_replica():
+                    etag = None
+        return finish_response(response, etag, authenticated)
+
+    def render_page(self, for_cache, request, *args, **kwargs):
+        # The list view's own get(), without the caching mixins that ran above.
+        with use_primary() if for_cache else nullcontext():
+            return render(request, BaseListView.get(self.page, request, *args, **kwargs))
+
+
+class BoardListView(AsyncPageView):
+    page_view = views.BoardListView
+
+
+class TopicListView(AsyncPageView):
+    page_view = views.TopicListView
+
+
+class PostListView(AsyncPageView):
+    page_view = views.PostListView
+
+    async def get(self, request, *args, **kwargs):
+        try:
+            return await self.get_live(request, *args, **kwargs)
+        except Http404:
+            if not await ArchivedTopic.objects.filter(pk=self.kwargs['topic_pk']).aexists():
+                raise
+        # Archived topics are rarely read, so their page stays a sync view.
+        return await sync_to_async(views.ArchivedPostListView.as_view())(request, *args, **kwargs)
+
+    async def get_live(self, request, *args, **kwargs):
+        authenticated = await sync_to_async(lambda: request.user.is_authenticated)()
+        if 'unread' in request.GET and authenticated:
+            page = self.page_view()
+            page.setup(request, *args, **kwargs)
+            return await sync_to_async(page.unread_redirect)()
+        response = await super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            await arecord_view(self.kwargs['topic_pk'])
+            if authenticated:
+                await sync_to_async(self.page.mark_page_read)(response.context_data['posts'])
+        return response
+
+
+async def topic_events(request, pk, topic_pk):
+    if not events.enabled():
+        raise Http404('Live updates are off.')
+    # Resolve the user now; the post template checks it while streaming.
+    await sync_to_async(lambda: request.user.is_authenticated)()
+    topic = await aget_object_or_404(Topic.objects.select_related('board'), board__pk=pk, pk=topic_pk)
+    cursor = events.resume_cursor(request) or await events.alatest_cursor(topic)
+    return events.event_stream_response(events.astream(request, topic, cursor))
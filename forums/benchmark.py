@@ -0,0 +1,304 @@
+"""
+Benchmarks for the forum hot paths.
+
+Each data size is seeded into a throwaway test database and the views are
+driven through the Django test client, recording latency and query counts
+per request. With ``concurrency`` set, the read views are also driven by
+that many simultaneous clients, once through the sync views on threads and
+once through the async views on an event loop, to compare throughput. With
+``template_renders`` set, the home, board and thread templates are rendered
+under each template configuration in ``template_profiles()``.
+"""
+import asyncio
+import datetime
+import json
+import os
+import platform
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import AsyncClient, Client, override_settings
+from django.template.loader import get_template
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from forum_project.templating import cached_templates
+
+from . import view_counter
+from .models import Board, Post, Topic
+from .pagination import KeysetPaginator
+from .seeding import seed
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def summarize(latencies, queries):
+    return {
+        'requests': len(latencies),
+        'p50_ms': round(percentile(latencies, 0.50), 2),
+        'p95_ms': round(percentile(latencies, 0.95), 2),
+        'p99_ms': round(percentile(latencies, 0.99), 2),
+        'mean_ms': round(sum(latencies) / len(latencies), 2),
+        'queries_mean': round(sum(queries) / len(queries), 1),
+        'queries_max': max(queries),
+        'throughput_rps': round(len(latencies) / (sum(latencies) / 1000), 1),
+    }
+
+
+def deep_page(url, queryset, page_size, ordering, middle):
+    """URL of a page halfway through a listing, in whichever pagination mode is active."""
+    paginator = KeysetPaginator(queryset, page_size, ordering)
+    if getattr(settings, 'FORUMS_PAGINATION', 'offset') == 'keyset':
+        return f'{url}?cursor={paginator.cursor_for(middle)}'
+    before = queryset.filter(paginator._after(paginator._key(middle), reverse=True)).count()
+    return f'{url}?page={before // page_size + 1}'
+
+
+def build_scenarios(board, topic):
+    board_url = reverse('board_topics', args=[board.pk])
+    topic_url = reverse('topic_posts', args=[board.pk, topic.pk])
+    topics = board.topics.all()
+    posts = topic.posts.all()
+    middle_topic = topics.order_by('-last_updated', '-id')[topics.count() // 2]
+    middle_post = posts.order_by('created_at', 'id')[posts.count() // 2]
+    counter = iter(range(10 ** 9))
+    return {
+        'home': lambda: ('get', reverse('home'), None),
+        'board_topics': lambda: ('get', board_url, None),
+        'board_topics_deep': lambda: ('get', deep_page(board_url, topics, 5, ('-last_updated', '-id'),
+                                                       middle_topic), None),
+        'topic_posts': lambda: ('get', topic_url, None),
+        'topic_posts_deep': lambda: ('get', deep_page(topic_url, posts, 2, ('created_at', 'id'),
+                                                      middle_post), None),
+        'reply_topic': lambda: ('post', reverse('reply_topic', args=[board.pk, topic.pk]),
+                                {'message': f'Benchmark reply {next(counter)}'}),
+        'new_topic': lambda: ('post', reverse('new_topic', args=[board.pk]),
+                              {'subject': f'Benchmark topic {next(counter)}', 'message': 'Benchmark message'}),
+    }
+
+
+@override_settings(FORUMS_RATELIMIT={'ENABLED': False})
+def run_scenario(client, scenario, requests, warmup):
+    latencies, queries = [], []
+    for i in range(warmup + requests):
+        method, url, data = scenario()
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = getattr(client, method)(url, data) if data else getattr(client, method)(url)
+            elapsed = (time.perf_counter() - start) * 1000
+        check_response(method, url, response)
+        if i >= warmup:
+            latencies.append(elapsed)
+            queries.append(len(captured))
+    return summarize(latencies, queries)
+
+
+CONCURRENT_SCENARIOS = ('home', 'board_topics', 'topic_posts')
+
+
+def check_response(method, url, response):
+    if response.status_code not in (200, 302):
+        raise RuntimeError(f'{method.upper()} {url} returned {response.status_code}')
+
+
+def summarize_concurrent(latencies, elapsed):
+    return {
+        'requests': len(latencies),
+        'p50_ms': round(percentile(latencies, 0.50), 2),
+        'p95_ms': round(percentile(latencies, 0.95), 2),
+        'p99_ms': round(percentile(latencies, 0.99), 2),
+        'throughput_rps': round(len(latencies) / elapsed, 1),
+    }
+
+
+@override_settings(ROOT_URLCONF='forum_project.urls', FORUMS_RATELIMIT={'ENABLED': False})
+def run_threaded(user, scenario, requests, concurrency):
+    """Sync views, one thread per client, as a threaded WSGI worker would run them."""
+    session = Client()
+    session.force_login(user)
+
+    def client_loop(count):
+        client = Client()
+        client.cookies = session.cookies
+        latencies = []
+        try:
+            for _ in range(count):
+                method, url, data = scenario()
+                start = time.perf_counter()
+                response = client.get(url)
+                latencies.append((time.perf_counter() - start) * 1000)
+                check_response(method, url, response)
+        finally:
+            connection.close()
+        return latencies
+
+    counts = [requests // concurrency + (i < requests % concurrency) for i in range(concurrency)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        latencies = [latency for chunk in pool.map(client_loop, counts) for latency in chunk]
+    return summarize_concurrent(latencies, time.perf_counter() - start)
+
+
+@override_settings(ROOT_URLCONF='forum_project.async_urls', FORUMS_RATELIMIT={'ENABLED': False})
+def run_async(user, scenario, requests, concurrency):
+    """Async views, all clients on one event loop, as an ASGI worker would run them."""
+    client = AsyncClient()
+    client.force_login(user)
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one_request():
+        async with slots:
+            method, url, data = scenario()
+            start = time.perf_counter()
+            response = await client.get(url)
+            check_response(method, url, response)
+            return (time.perf_counter() - start) * 1000
+
+    async def run_all():
+        return await asyncio.gather(*(one_request() for _ in range(requests)))
+
+    start = time.perf_counter()
+    latencies = async_to_sync(run_all)()
+    return summarize_concurrent(latencies, time.perf_counter() - start)
+
+
+def template_profiles():
+    default = settings.TEMPLATES[0]
+    uncached = {
+        **default,
+        'APP_DIRS': False,
+        'OPTIONS': {
+            **default['OPTIONS'],
+            'loaders': [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ],
+        },
+    }
+    return {
+        'uncached': [uncached],
+        'default': [default],
+        'production': cached_templates(settings.TEMPLATES),
+    }
+
+
+def run_template_renders(client, available, renders):
+    """Time the first and the following renders of each page's template under every profile."""
+    pages = []
+    for name in CONCURRENT_SCENARIOS:
+        method, url, data = available[name]()
+        response = client.get(url)
+        check_response(method, url, response)
+        pages.append((response.template_name[0], response.context_data, response.wsgi_request))
+
+    results = []
+    for profile, templates in template_profiles().items():
+        with override_settings(TEMPLATES=templates):
+            for template_name, context, request in pages:
+                start = time.perf_counter()
+                get_template(template_name).render(context, request)
+                cold = (time.perf_counter() - start) * 1000
+                latencies = []
+                for _ in range(renders):
+                    start = time.perf_counter()
+                    get_template(template_name).render(context, request)
+                    latencies.append((time.perf_counter() - start) * 1000)
+                results.append({
+                    'scenario': f'render:{template_name}',
+                    'mode': profile,
+                    'cold_ms': round(cold, 2),
+                    'p50_ms': round(percentile(latencies, 0.50), 3),
+                    'p95_ms': round(percentile(latencies, 0.95), 3),
+                    'mean_ms': round(sum(latencies) / len(latencies), 3),
+                })
+    return results
+
+
+def size_parameters(posts):
+    return {
+        'boards': 5,
+        'topics': max(posts // 10, 5),
+        'posts': posts,
+        'users': max(posts // 100, 10),
+    }
+
+
+def run(sizes, requests=50, warmup=5, scenarios=None, concurrency=None, template_renders=None, log=None):
+    """Seed each size in turn and benchmark every scenario; return one result per (size, scenario, mode)."""
+    log = log or (lambda message: None)
+    results = []
+    for size in sizes:
+        call_command('flush', interactive=False, verbosity=0)
+        cache.clear()
+        view_counter.get_backend().drain()
+        parameters = size_parameters(size)
+        log(f'Seeding {parameters}...')
+        seed(**parameters)
+
+        board = Board.objects.order_by('-topics_count').first()
+        topic = board.topics.order_by('-reply_count').first()
+        user = get_user_model().objects.order_by('pk').first()
+        client = Client()
+        client.force_login(user)
+        available = build_scenarios(board, topic)
+        for name in scenarios or available:
+            summary = run_scenario(client, available[name], requests, warmup)
+            result = {'size': size, 'scenario': name, 'mode': 'sequential', **summary}
+            results.append(result)
+            log(f'{size:>9} {name:<20} p50 {result["p50_ms"]:>8} ms  p95 {result["p95_ms"]:>8} ms  '
+                f'{result["queries_mean"]:>5} queries  {result["throughput_rps"]:>8} req/s')
+
+        if concurrency:
+            for name in CONCURRENT_SCENARIOS:
+                if scenarios and name not in scenarios:
+                    continue
+                for mode, runner in (('threads', run_threaded), ('async', run_async)):
+                    summary = runner(user, available[name], requests, concurrency)
+                    result = {'size': size, 'scenario': name, 'mode': mode, 'concurrency': concurrency, **summary}
+                    results.append(result)
+                    log(f'{size:>9} {name:<20} {mode:<8} x{concurrency:<4} p50 {result["p50_ms"]:>8} ms  '
+                        f'p95 {result["p95_ms"]:>8} ms  {result["throughput_rps"]:>8} req/s')
+        if template_renders:
+            for result in run_template_renders(client, available, template_renders):
+                results.append({'size': size, **result})
+                log(f'{size:>9} {result["scenario"]:<28} {result["mode"]:<10} first {result["cold_ms"]:>8} ms  '
+                    f'p50 {result["p50_ms"]:>7} ms  p95 {result["p95_ms"]:>7} ms')
+        log(f'Database now holds {Topic.objects.count()} topics and {Post.objects.count()} posts.')
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(results, path, **extra):
+    report = {
+        'revision': git_revision(),
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'pagination': getattr(settings, 'FORUMS_PAGINATION', 'offset'),
+        **extra,
+        'results': results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as output:
+        json.dump(report, output, indent=2)
+    return report
@@ -0,0 +1,129 @@
+"""
+Page and fragment caching for anonymous visitors, and conditional GET.
+
+Cached pages are keyed on version counters for the boards, board and topic
+they show. The write signals bump these counters once the write commits,
+which orphans the stale entries instead of having to find and delete them. The same counters are
+the ETag validators, so a 304 costs no database queries. A signed-in user's
+ETag also covers their CSRF secret, so a page kept from before they logged
+in again is not reused with stale form tokens.
+
+The counters move as soon as the primary commits, but a read replica can
+still be behind, so nothing read from a replica is stored under them: pages
+for the cache are rendered from the primary, and a signed-in user's page
+read from a replica is sent without an ETag.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, quote_etag
+
+from .instrumentation import render
+from .replicas import use_primary, using_replica
+
+DEFAULTS = {
+    'PAGE_TIMEOUT': 300,
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'FORUMS_CACHE', {})}
+
+
+def version_key(scope):
+    return f'forums:version:{scope}'
+
+
+def get_versions(scopes):
+    keys = [version_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        # Seed from the clock so a lost counter never resurrects an older version.
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def bump(*scopes):
+    for scope in scopes:
+        try:
+            cache.incr(version_key(scope))
+        except ValueError:
+            cache.set(version_key(scope), time.time_ns(), timeout=None)
+
+
+def page_key(request, scopes):
+    versions = '.'.join(str(version) for version in get_versions(scopes))
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'forums:page:{path}:{versions}'
+
+
+def page_etag(request, scopes):
+    versions = '.'.join(str(version) for version in get_versions(scopes))
+    validator = f'{request.get_full_path()}:{request.user.pk or 0}:{versions}'
+    if request.user.pk:
+        # Signed-in pages carry forms, whose tokens only match the CSRF secret
+        # they were rendered with. Logging in again rotates it.
+        validator += ':' + request.META.get('CSRF_COOKIE', '')
+    return hashlib.md5(validator.encode()).hexdigest()
+
+
+def conditional_response(request, scopes):
+    """The page's ETag, and a 304 (or 412) response if the request already has it, else None."""
+    etag = quote_etag(page_etag(request, scopes))
+    return etag, get_conditional_response(request, etag=etag)
+
+
+def finish_response(response, etag, authenticated):
+    if etag:
+        response.headers.setdefault('ETag', etag)
+    patch_cache_control(response, no_cache=True)
+    if authenticated:
+        patch_cache_control(response, private=True)
+    return response
+
+
+def cached_page(key):
+    content = cache.get(key)
+    return None if content is None else HttpResponse(content)
+
+
+def store_page(key, response):
+    if response.status_code == 200:
+        cache.set(key, response.content, get_config()['PAGE_TIMEOUT'])
+
+
+class ConditionalGetMixin:
+    """Answer 304 Not Modified when nothing in the page's cache scopes has changed."""
+
+    def get(self, request, *args, **kwargs):
+        authenticated = request.user.is_authenticated
+        etag, response = conditional_response(request, self.get_cache_scopes())
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+            if authenticated and using_replica():
+                etag = None
+        return finish_response(response, etag, authenticated)
+
+
+class AnonymousCacheMixin:
+    """Serve GET requests from anonymous users out of the page cache."""
+
+    def get_cache_scopes(self):
+        raise NotImplementedError('subclasses of AnonymousCacheMixin must provide get_cache_scopes()')
+
+    def get(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return super().get(request, *args, **kwargs)
+        key = page_key(request, self.get_cache_scopes())
+        response = cached_page(key)
+        if response is None:
+            # Rendered here rather than on the way out, so the template's queries go to the primary too.
+            with use_primary():
+                response = render(request, super().get(request, *args, **kwargs))
+            store_page(key, response)
+        return response
@@ -0,0 +1,267 @@
+"""
+Live thread updates over server-sent events.
+
+A stream remembers the newest post it has sent and the time of the newest
+edit. Each time it wakes up it asks the database for posts past that point,
+so a reconnecting client resumes from its ``Last-Event-ID`` without missing
+anything.
+
+The backend decides when a stream wakes up:
+
+* ``LocalBackend`` wakes the streams of a topic when a post in it is saved
+  by the same process. Publishing is in-process only, so use it with a
+  single web process, or together with a short ``KEEPALIVE``.
+* ``PollingBackend`` wakes every stream every ``POLL_INTERVAL`` seconds, which
+  picks up posts written by any process.
+
+Streams close after ``STREAM_TIMEOUT`` seconds and the browser reconnects.
+Under WSGI every open stream still holds a worker for that long, so live
+updates are off unless ``ENABLED`` is set, which the settings do by default
+only when the site is served through ASGI. Thread pages then don't subscribe
+and the stream URL answers 404.
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Max, Q
+from django.http import StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+DEFAULTS = {
+    'ENABLED': False,
+    'BACKEND': 'forums.events.LocalBackend',
+    'OPTIONS': {},
+    'KEEPALIVE': 15,
+    'STREAM_TIMEOUT': 55,
+    'RETRY': 3000,  # milliseconds the browser waits before reconnecting
+}
+
+
+def get_config():
+    config = {**DEFAULTS, **getattr(settings, 'FORUMS_EVENTS', {})}
+    config['OPTIONS'] = {**DEFAULTS['OPTIONS'], **config['OPTIONS']}
+    return config
+
+
+class Subscription:
+    def __init__(self):
+        self.event = threading.Event()
+
+    def notify(self):
+        self.event.set()
+
+    def wait(self, timeout):
+        woken = self.event.wait(timeout)
+        self.event.clear()
+        return woken
+
+
+class AsyncSubscription:
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.event = asyncio.Event()
+
+    def notify(self):
+        self.loop.call_soon_threadsafe(self.event.set)
+
+    async def wait(self, timeout):
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self.event.clear()
+        return True
+
+
+class LocalBackend:
+    """Wakes the streams of this process when a post is saved in it."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def publish(self, topic_id):
+        with self._lock:
+            subscribers = list(self._subscribers.get(topic_id, ()))
+        for subscription in subscribers:
+            subscription.notify()
+
+    def subscribe(self, topic_id, subscription):
+        with self._lock:
+            self._subscribers[topic_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, topic_id, subscription):
+        with self._lock:
+            self._subscribers[topic_id].discard(subscription)
+            if not self._subscribers[topic_id]:
+                del self._subscribers[topic_id]
+
+
+class PollingSubscription:
+    def __init__(self, interval):
+        self.interval = interval
+
+    def notify(self):
+        pass
+
+    def wait(self, timeout):
+        time.sleep(min(timeout, self.interval))
+        return True
+
+
+class AsyncPollingSubscription(PollingSubscription):
+    async def wait(self, timeout):
+        await asyncio.sleep(min(timeout, self.interval))
+        return True
+
+
+class PollingBackend:
+    """Checks the database every ``POLL_INTERVAL`` seconds; sees writes from every process."""
+
+    def __init__(self, POLL_INTERVAL=2):
+        self.interval = POLL_INTERVAL
+
+    def publish(self, topic_id):
+        pass
+
+    def subscribe(self, topic_id, subscription):
+        if isinstance(subscription, AsyncSubscription):
+            return AsyncPollingSubscription(self.interval)
+        return PollingSubscription(self.interval)
+
+    def unsubscribe(self, topic_id, subscription):
+        pass
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                config = get_config()
+                _backend = import_string(config['BACKEND'])(**config['OPTIONS'])
+    return _backend
+
+
+def publish(topic_id):
+    get_backend().publish(topic_id)
+
+
+def encode_cursor(last_post_id, since):
+    return f'{last_post_id}.{round(since.timestamp() * 1000000)}'
+
+
+def decode_cursor(value):
+    try:
+        last_post_id, micros = value.split('.')
+        return int(last_post_id), datetime.fromtimestamp(int(micros) / 1000000, tz=dt_timezone.utc)
+    except (AttributeError, ValueError, OverflowError, OSError):
+        return None
+
+
+def resume_cursor(request):
+    """Where a reconnecting browser left off, or where the page it came from ended."""
+    return decode_cursor(request.headers.get('Last-Event-ID') or request.GET.get('after'))
+
+
+def latest_cursor(topic):
+    return topic.posts.aggregate(last=Max('pk'))['last'] or 0, timezone.now()
+
+
+async def alatest_cursor(topic):
+    return (await topic.posts.aaggregate(last=Max('pk')))['last'] or 0, timezone.now()
+
+
+def enabled():
+    return get_config()['ENABLED']
+
+
+def initial_cursor(page):
+    """Cursor for the stream of a rendered thread page, or None unless it is the last page."""
+    if not enabled() or page is None or page.has_next() or not page.object_list:
+        return None
+    return encode_cursor(max(post.pk for post in page.object_list), timezone.now())
+
+
+def changes(topic, cursor):
+    from .models import Post
+
+    last_post_id, since = cursor
+    return (
+        Post.objects.filter(topic=topic)
+        .filter(Q(pk__gt=last_post_id) | Q(updated_at__gt=since))
+        .select_related('created_by')
+        .order_by('pk')
+    )
+
+
+def advance(cursor, post):
+    last_post_id, since = cursor
+    return max(last_post_id, post.pk), max(since, post.updated_at or since)
+
+
+def format_event(request, topic, post, cursor):
+    html = render_to_string('includes/post.html', {'post': post, 'topic': topic}, request)
+    data = json.dumps({'pk': post.pk, 'html': html})
+    return f'id: {encode_cursor(*cursor)}\nevent: post\ndata: {data}\n\n'
+
+
+def event_stream_response(events):
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # stop nginx from holding events back
+    return response
+
+
+def stream(request, topic, cursor):
+    """Sync event stream, as served by a WSGI worker."""
+    config = get_config()
+    backend = get_backend()
+    subscription = backend.subscribe(topic.pk, Subscription())
+    deadline = time.monotonic() + config['STREAM_TIMEOUT']
+    try:
+        yield f'retry: {config["RETRY"]}\n\n'
+        while True:
+            for post in changes(topic, cursor):
+                cursor = advance(cursor, post)
+                yield format_event(request, topic, post, cursor)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            if not subscription.wait(min(config['KEEPALIVE'], remaining)):
+                yield ': keepalive\n\n'
+    finally:
+        backend.unsubscribe(topic.pk, subscription)
+
+
+async def astream(request, topic, cursor):
+    """Async event stream, as served by an ASGI worker."""
+    config = get_config()
+    backend = get_backend()
+    subscription = backend.subscribe(topic.pk, AsyncSubscription())
+    deadline = time.monotonic() + config['STREAM_TIMEOUT']
+    try:
+        yield f'retry: {config["RETRY"]}\n\n'
+        while True:
+            async for post in changes(topic, cursor):
+                cursor = advance(cursor, post)
+                yield format_event(request, topic, post, cursor)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            if not await subscription.wait(min(config['KEEPALIVE'], remaining)):
+                yield ': keepalive\n\n'
+    finally:
+        backend.unsubscribe(topic.pk, subscription)
@@ -0,0 +1,299 @@
+"""
+Per-view query and latency instrumentation.
+
+``QueryInstrumentationMiddleware`` wraps every database connection for the
+duration of a request and records the number of queries, SQL time, template
+render time and repeated query fingerprints under the resolved URL name.
+Samples go into per-minute histograms that each process writes to
+``SPOOL_DIR`` so the ``query_stats`` command can merge them. Views that
+render their response themselves, such as the cached pages, do it through
+``render()`` so the time is still counted.
+"""
+import atexit
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': False,
+    'HEADERS': None,  # Defaults to settings.DEBUG
+    'QUERY_BUDGET': None,
+    'WINDOW': 15,  # Minutes of history kept per process
+    'FLUSH_INTERVAL': 60,
+    'SPOOL_DIR': None,
+}
+
+# Upper bounds (ms or queries) of the histogram buckets; the last bucket is open-ended.
+BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+
+def get_config():
+    config = {**DEFAULTS, **getattr(settings, 'FORUMS_INSTRUMENTATION', {})}
+    if config['HEADERS'] is None:
+        config['HEADERS'] = settings.DEBUG
+    if config['SPOOL_DIR'] is None:
+        config['SPOOL_DIR'] = os.path.join(settings.BASE_DIR, 'var', 'stats')
+    return config
+
+
+def fingerprint(sql):
+    sql = re.sub(r'\bIN \((?:%s, )*%s\)', 'IN (...)', sql)
+    return re.sub(r'\s+', ' ', sql).strip()
+
+
+class Histogram:
+    def __init__(self, counts=None, total=0.0):
+        self.counts = counts or [0] * (len(BUCKETS) + 1)
+        self.total = total
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def add(self, value):
+        index = next((i for i, bound in enumerate(BUCKETS) if value <= bound), len(BUCKETS))
+        self.counts[index] += 1
+        self.total += value
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.total += other.total
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of samples."""
+        target = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= target:
+                return BUCKETS[index] if index < len(BUCKETS) else float('inf')
+        return 0
+
+    def to_dict(self):
+        return {'counts': self.counts, 'total': self.total}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(list(data['counts']), data['total'])
+
+
+class ViewStats:
+    METRICS = ('latency', 'queries', 'sql_time', 'render_time')
+
+    def __init__(self):
+        self.histograms = {metric: Histogram() for metric in self.METRICS}
+        self.over_budget = 0
+        self.duplicates = Counter()
+
+    def merge(self, other):
+        for metric in self.METRICS:
+            self.histograms[metric].merge(other.histograms[metric])
+        self.over_budget += other.over_budget
+        self.duplicates.update(other.duplicates)
+
+    def to_dict(self):
+        return {
+            'histograms': {metric: histogram.to_dict() for metric, histogram in self.histograms.items()},
+            'over_budget': self.over_budget,
+            'duplicates': dict(self.duplicates.most_common(20)),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.histograms = {metric: Histogram.from_dict(data['histograms'][metric]) for metric in cls.METRICS}
+        stats.over_budget = data['over_budget']
+        stats.duplicates = Counter(data['duplicates'])
+        return stats
+
+
+class StatsRegistry:
+    """Rolling per-minute slices of ``ViewStats`` keyed by URL name."""
+
+    def __init__(self, window):
+        self.lock = threading.Lock()
+        self.slices = deque(maxlen=window)
+
+    def record(self, name, sample):
+        minute = int(time.time() // 60)
+        with self.lock:
+            if not self.slices or self.slices[-1][0] != minute:
+                self.slices.append((minute, {}))
+            stats = self.slices[-1][1].setdefault(name, ViewStats())
+            stats.histograms['latency'].add(sample.latency)
+            stats.histograms['queries'].add(sample.count)
+            stats.histograms['sql_time'].add(sample.sql_time)
+            if sample.render_time is not None:
+                stats.histograms['render_time'].add(sample.render_time)
+            stats.over_budget += sample.over_budget
+            stats.duplicates.update(sample.duplicates())
+
+    def snapshot(self):
+        with self.lock:
+            return [
+                {'minute': minute, 'views': {name: stats.to_dict() for name, stats in views.items()}}
+                for minute, views in self.slices
+            ]
+
+
+def merge_snapshots(snapshots, since_minute=0):
+    merged = {}
+    for snapshot in snapshots:
+        for minute_slice in snapshot:
+            if minute_slice['minute'] < since_minute:
+                continue
+            for name, data in minute_slice['views'].items():
+                merged.setdefault(name, ViewStats()).merge(ViewStats.from_dict(data))
+    return merged
+
+
+def read_spool(spool_dir):
+    snapshots = []
+    if not os.path.isdir(spool_dir):
+        return snapshots
+    for filename in os.listdir(spool_dir):
+        if filename.endswith('.json'):
+            try:
+                with open(os.path.join(spool_dir, filename)) as spool:
+                    snapshots.append(json.load(spool))
+            except (OSError, ValueError):
+                continue
+    return snapshots
+
+
+class RequestSample:
+    def __init__(self):
+        self.count = 0
+        self.sql_time = 0.0
+        self.latency = 0.0
+        self.render_time = None
+        self.render_started = None
+        self.over_budget = 0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += (time.perf_counter() - start) * 1000
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def duplicates(self):
+        return {sql: count for sql, count in self.fingerprints.items() if count > 1}
+
+
+def render(request, response):
+    """Render ``response`` now, recording the time as the request's render time."""
+    start = time.perf_counter()
+    response.render()
+    sample = getattr(request, '_query_sample', None)
+    if sample is not None:
+        sample.render_time = (time.perf_counter() - start) * 1000
+    return response
+
+
+class QueryInstrumentationMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.config = get_config()
+        if not self.config['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        self.registry = StatsRegistry(self.config['WINDOW'])
+        self.spool_path = os.path.join(self.config['SPOOL_DIR'], f'stats-{os.getpid()}.json')
+        self.last_flush = time.monotonic()
+        atexit.register(self.flush)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        sample = request._query_sample = RequestSample()
+        start = time.perf_counter()
+        with self.wrap_connections(sample):
+            response = self.get_response(request)
+        return self.finish(request, response, sample, start)
+
+    async def __acall__(self, request):
+        sample = request._query_sample = RequestSample()
+        start = time.perf_counter()
+        with self.wrap_connections(sample):
+            response = await self.get_response(request)
+        return self.finish(request, response, sample, start)
+
+    def wrap_connections(self, sample):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(sample))
+        return stack
+
+    def finish(self, request, response, sample, start):
+        sample.latency = (time.perf_counter() - start) * 1000
+
+        match = request.resolver_match
+        name = match.view_name if match else 'unresolved'
+        budget = self.config['QUERY_BUDGET']
+        if budget is not None and sample.count > budget:
+            sample.over_budget = 1
+            logger.warning(
+                '%s ran %d queries (budget %d) in %.1f ms; repeated: %s',
+                name, sample.count, budget, sample.latency,
+                '; '.join(f'{count}x {sql[:120]}' for sql, count in Counter(sample.duplicates()).most_common(3)),
+            )
+        self.registry.record(name, sample)
+
+        if self.config['HEADERS']:
+            response['X-Query-Count'] = str(sample.count)
+            response['X-Duplicate-Queries'] = str(sum(count - 1 for count in sample.duplicates().values()))
+            timings = [f'db;dur={sample.sql_time:.1f}', f'total;dur={sample.latency:.1f}']
+            if sample.render_time is not None:
+                timings.append(f'render;dur={sample.render_time:.1f}')
+            response['Server-Timing'] = ', '.join(timings)
+
+        if time.monotonic() - self.last_flush >= self.config['FLUSH_INTERVAL']:
+            self.flush()
+        return response
+
+    def process_template_response(self, request, response):
+        if response.is_rendered:
+            # The view rendered it through render(), which timed it.
+            return response
+        sample = request._query_sample
+        sample.render_started = time.perf_counter()
+
+        def rendered(response):
+            sample.render_time = (time.perf_counter() - sample.render_started) * 1000
+
+        response.add_post_render_callback(rendered)
+        return response
+
+    def flush(self):
+        self.last_flush = time.monotonic()
+        try:
+            os.makedirs(self.config['SPOOL_DIR'], exist_ok=True)
+            temporary = f'{self.spool_path}.tmp'
+            with open(temporary, 'w') as spool:
+                json.dump(self.registry.snapshot(), spool)
+            os.replace(temporary, self.spool_path)
+        except OSError:
+            logger.exception('Could not write query stats to %s', self.spool_path)
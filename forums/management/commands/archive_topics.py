@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from forums import archive
+
+
+class Command(BaseCommand):
+    help = 'Move topics without recent activity, and their posts, to the archive tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Archive topics inactive for this many days.')
+        parser.add_argument('--batch-size', type=int, help='Topics per transaction.')
+
+    def handle(self, *args, **options):
+        archived = archive.archive_topics(options['days'], options['batch_size'], log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(f'Archived {archived} topics.'))
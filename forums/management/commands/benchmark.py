@@ -0,0 +1,45 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from forums import benchmark
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the forum views against seeded data in a throwaway test database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000',
+                            help='Comma separated numbers of posts to seed, one benchmark round each.')
+        parser.add_argument('--requests', type=int, default=50, help='Measured requests per scenario.')
+        parser.add_argument('--warmup', type=int, default=5, help='Unmeasured requests per scenario.')
+        parser.add_argument('--scenario', action='append', dest='scenarios',
+                            help='Only run the given scenario (repeatable).')
+        parser.add_argument('--concurrency', type=int,
+                            help='Also compare sync (threads) and async views with this many simultaneous clients.')
+        parser.add_argument('--templates', type=int, dest='template_renders',
+                            help='Also time this many renders of each page template per template configuration.')
+        parser.add_argument('--output', help='Where to write the JSON results.')
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        output = options['output'] or os.path.join(
+            settings.BASE_DIR, 'var', 'benchmarks', time.strftime('%Y%m%d-%H%M%S.json'),
+        )
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            results = benchmark.run(
+                sizes, options['requests'], options['warmup'], options['scenarios'], options['concurrency'],
+                options['template_renders'],
+                log=self.stdout.write,
+            )
+            benchmark.write_results(results, output)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+        self.stdout.write(self.style.SUCCESS(f'Wrote results to {output}'))
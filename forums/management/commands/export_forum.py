@@ -0,0 +1,21 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from forums import transfer
+
+
+class Command(BaseCommand):
+    help = 'Stream users, boards, topics and posts to a JSONL file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help="Path of the JSONL file, or '-' for stdout.")
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        if options['output'] == '-':
+            transfer.export(sys.stdout, options['chunk_size'])
+            return
+        with open(options['output'], 'w') as output:
+            lines = transfer.export(output, options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Exported {lines} objects to {options["output"]}.'))
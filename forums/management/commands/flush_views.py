@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from forums.view_counter import flush_views
+
+
+class Command(BaseCommand):
+    help = 'Write buffered topic view counts to the database.'
+
+    def handle(self, *args, **options):
+        topics = flush_views()
+        self.stdout.write(self.style.SUCCESS(f'Flushed views for {topics} topics.'))
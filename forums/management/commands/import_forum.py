@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from forums import transfer
+
+
+class Command(BaseCommand):
+    help = 'Import users, boards, topics and posts from a JSONL file written by export_forum.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='Path of the JSONL file.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Objects per transaction.')
+        parser.add_argument('--resume', action='store_true', help='Continue an interrupted import.')
+
+    def handle(self, *args, **options):
+        try:
+            importer = transfer.Importer(
+                options['input'], options['batch_size'], options['resume'], log=self.stdout.write,
+            )
+        except (FileExistsError, FileNotFoundError) as error:
+            raise CommandError(error)
+        imported = importer.run()
+        self.stdout.write(self.style.SUCCESS(f'Imported {imported} objects.'))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from forums import moderation
+from forums.models import Topic
+
+
+class Command(BaseCommand):
+    help = 'Move the posts of one or more topics into another topic and delete the emptied topics.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('target', type=int, help='Id of the topic to keep.')
+        parser.add_argument('sources', type=int, nargs='+', help='Ids of the topics to merge into it.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Posts per transaction.')
+
+    def handle(self, *args, **options):
+        try:
+            target = Topic.objects.get(pk=options['target'])
+        except Topic.DoesNotExist:
+            raise CommandError(f'Topic {options["target"]} does not exist.')
+        sources = Topic.objects.filter(pk__in=options['sources'])
+        moved = moderation.merge_topics(target, sources, options['batch_size'], log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(f'Merged {moved} posts into "{target}".'))
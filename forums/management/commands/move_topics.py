@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from forums import moderation
+from forums.models import Board, Topic
+
+
+class Command(BaseCommand):
+    help = 'Move topics to another board.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('board', type=int, help='Id of the board to move the topics to.')
+        parser.add_argument('topics', type=int, nargs='+', help='Ids of the topics to move.')
+
+    def handle(self, *args, **options):
+        try:
+            board = Board.objects.get(pk=options['board'])
+        except Board.DoesNotExist:
+            raise CommandError(f'Board {options["board"]} does not exist.')
+        moved = moderation.move_topics(Topic.objects.filter(pk__in=options['topics']), board)
+        self.stdout.write(self.style.SUCCESS(f'Moved {moved} topics to {board}.'))
@@ -0,0 +1,23 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from forums import moderation
+
+
+class Command(BaseCommand):
+    help = 'Delete every topic and post a user wrote, and deactivate or delete the account.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('--delete-account', action='store_true', help='Delete the account instead of deactivating it.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Posts per transaction.')
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(username=options['username'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'User "{options["username"]}" does not exist.')
+        topics, posts = moderation.purge_user(
+            user, options['delete_account'], options['batch_size'], log=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS(f'Deleted {topics} topics and {posts} posts by {options["username"]}.'))
@@ -0,0 +1,63 @@
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from forums.instrumentation import get_config, merge_snapshots, read_spool
+
+
+class Command(BaseCommand):
+    help = 'Show per-view query counts and latency recorded by QueryInstrumentationMiddleware.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--minutes', type=int, default=get_config()['WINDOW'],
+                            help='Only include samples from the last N minutes.')
+        parser.add_argument('--json', action='store_true', help='Print machine-readable output.')
+        parser.add_argument('--duplicates', type=int, default=3,
+                            help='Number of repeated query fingerprints to show per view.')
+        parser.add_argument('--clear', action='store_true', help='Delete the recorded stats afterwards.')
+
+    def handle(self, *args, **options):
+        spool_dir = get_config()['SPOOL_DIR']
+        since = int(time.time() // 60) - options['minutes'] + 1
+        stats = merge_snapshots(read_spool(spool_dir), since_minute=since)
+
+        report = {}
+        for name, view in sorted(stats.items()):
+            latency = view.histograms['latency']
+            queries = view.histograms['queries']
+            report[name] = {
+                'requests': latency.count,
+                'latency_p50_ms': latency.percentile(0.5),
+                'latency_p95_ms': latency.percentile(0.95),
+                'latency_p99_ms': latency.percentile(0.99),
+                'queries_mean': round(queries.mean(), 1),
+                'queries_p95': queries.percentile(0.95),
+                'sql_ms_mean': round(view.histograms['sql_time'].mean(), 2),
+                'render_ms_mean': round(view.histograms['render_time'].mean(), 2),
+                'over_budget': view.over_budget,
+                'duplicates': dict(view.duplicates.most_common(options['duplicates'])),
+            }
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        elif not report:
+            self.stdout.write('No requests recorded.')
+        else:
+            header = f'{"view":<24}{"reqs":>7}{"p50ms":>8}{"p95ms":>8}{"p99ms":>8}{"queries":>9}' \
+                     f'{"q p95":>7}{"sql ms":>8}{"render":>8}{"budget":>8}'
+            self.stdout.write(header)
+            for name, row in report.items():
+                self.stdout.write(
+                    f'{name:<24}{row["requests"]:>7}{row["latency_p50_ms"]:>8}{row["latency_p95_ms"]:>8}'
+                    f'{row["latency_p99_ms"]:>8}{row["queries_mean"]:>9}{row["queries_p95"]:>7}'
+                    f'{row["sql_ms_mean"]:>8}{row["render_ms_mean"]:>8}{row["over_budget"]:>8}'
+                )
+                for sql, count in row['duplicates'].items():
+                    self.stdout.write(f'    {count}x {sql[:100]}')
+
+        if options['clear'] and os.path.isdir(spool_dir):
+            for filename in os.listdir(spool_dir):
+                if filename.endswith('.json'):
+                    os.remove(os.path.join(spool_dir, filename))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from forums.ratelimit import get_limited_counts
+
+
+class Command(BaseCommand):
+    help = 'Show how often each rate limit has rejected a request.'
+
+    def handle(self, *args, **options):
+        for (scope, kind), count in sorted(get_limited_counts().items()):
+            self.stdout.write(f'{scope:<16}{kind:<6}{count:>8}')
@@ -0,0 +1,16 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from forums.models import Board, Topic
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized forum counters from the posts and topics tables.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            Topic.objects.all().refresh_counters()
+            boards = Board.objects.all().refresh_counters()
+            users = get_user_model().objects.all().refresh_counters()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt counters for {boards} boards and {users} users.'))
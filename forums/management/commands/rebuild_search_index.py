@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from forums import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for topics and posts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        search.rebuild_index(options['batch_size'], log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS('Search index rebuilt.'))
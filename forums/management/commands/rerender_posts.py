@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from forums import rendering
+
+
+class Command(BaseCommand):
+    help = 'Render the HTML of every post that was rendered by an older version of the renderer.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Posts per query.')
+
+    def handle(self, *args, **options):
+        rendered = rendering.rerender_posts(options['batch_size'], log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(f'Rendered {rendered} posts with renderer {rendering.version()}.'))
@@ -0,0 +1,36 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils.module_loading import autodiscover_modules
+
+from forums.taskqueue import run_pending
+
+
+class Command(BaseCommand):
+    help = 'Run queued background tasks. Needed when FORUMS_TASK_BROKER is "database".'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run the tasks that are due and exit.')
+        parser.add_argument('--batch-size', type=int, default=10)
+        parser.add_argument('--sleep', type=float, default=1.0, help='Seconds to wait when the queue is empty.')
+
+    def handle(self, *args, **options):
+        autodiscover_modules('tasks')
+        self.stopping = False
+        if not options['once']:
+            signal.signal(signal.SIGTERM, self.stop)
+            signal.signal(signal.SIGINT, self.stop)
+
+        while True:
+            close_old_connections()
+            succeeded, failed = run_pending(options['batch_size'])
+            if succeeded or failed:
+                self.stdout.write(f'Ran {succeeded + failed} tasks ({failed} failed).')
+            if options['once'] or self.stopping:
+                break
+            time.sleep(options['sleep'])
+
+    def stop(self, signum, frame):
+        self.stopping = True
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from forums.seeding import seed
+
+
+class Command(BaseCommand):
+    help = 'Fill the database with synthetic boards, topics, posts and users.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--boards', type=int, default=5)
+        parser.add_argument('--topics', type=int, default=100)
+        parser.add_argument('--posts', type=int, default=1000)
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for reproducible data.')
+
+    def handle(self, *args, **options):
+        seed(
+            boards=options['boards'],
+            topics=options['topics'],
+            posts=options['posts'],
+            users=options['users'],
+            batch_size=options['batch_size'],
+            seed=options['seed'],
+            log=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS('Seeded the forum.'))
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:25
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def populate_counters(apps, schema_editor):
+    Board = apps.get_model('forums', 'Board')
+    Topic = apps.get_model('forums', 'Topic')
+    Post = apps.get_model('forums', 'Post')
+
+    def count(queryset, field):
+        return Coalesce(Subquery(
+            queryset.order_by().values(field).annotate(count=Count('pk')).values('count')
+        ), 0)
+
+    posts = Post.objects.filter(topic__board=OuterRef('pk'))
+    Board.objects.update(
+        posts_count=count(posts, 'topic__board'),
+        topics_count=count(Topic.objects.filter(board=OuterRef('pk')), 'board'),
+        last_post=Subquery(posts.order_by('-created_at', '-pk').values('pk')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forums', '0002_topic_views'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='board',
+            name='last_post',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='forums.post'),
+        ),
+        migrations.AddField(
+            model_name='board',
+            name='posts_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='board',
+            name='topics_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forums', '0003_board_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['topic', 'created_at', 'id'], name='forums_post_topic_created'),
+        ),
+        migrations.AddIndex(
+            model_name='topic',
+            index=models.Index(fields=['board', '-last_updated', '-id'], name='forums_topic_board_recent'),
+        ),
+    ]
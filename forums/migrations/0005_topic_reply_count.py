@@ -0,0 +1,43 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:28
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+import django.db.models.deletion
+
+
+def populate_topic_counters(apps, schema_editor):
+    Topic = apps.get_model('forums', 'Topic')
+    Post = apps.get_model('forums', 'Post')
+    posts = Post.objects.filter(topic=OuterRef('pk'))
+    replies = Coalesce(Subquery(
+        posts.order_by().values('topic').annotate(count=Count('pk')).values('count')
+    ), 0) - 1
+    latest = posts.annotate(activity=Coalesce('updated_at', 'created_at')).order_by('-activity', '-pk')
+    Topic.objects.update(
+        reply_count=Greatest(replies, 0),
+        last_poster=Subquery(latest.values(user=Coalesce('updated_by', 'created_by'))[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('forums', '0004_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='topic',
+            name='last_poster',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='topic',
+            name='reply_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_topic_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_last_updated(apps, schema_editor):
+    Topic = apps.get_model('forums', 'Topic')
+    Post = apps.get_model('forums', 'Post')
+    latest = Post.objects.filter(topic=OuterRef('pk')).annotate(
+        activity=Coalesce('updated_at', 'created_at'),
+    ).order_by('-activity')
+    Topic.objects.update(last_updated=Coalesce(Subquery(latest.values('activity')[:1]), 'last_updated'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forums', '0005_topic_reply_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_last_updated, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+from django.db import OperationalError, migrations
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    try:
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE forums_search USING fts5(subject, message, tokenize='porter unicode61')"
+        )
+    except OperationalError:
+        # SQLite was built without FTS5; search falls back to unindexed lookups.
+        return
+    schema_editor.execute(
+        "INSERT INTO forums_search (rowid, subject, message) "
+        "SELECT id * 2, '', message FROM forums_post"
+    )
+    schema_editor.execute(
+        "INSERT INTO forums_search (rowid, subject, message) "
+        "SELECT id * 2 + 1, subject, '' FROM forums_topic"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS forums_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forums', '0006_topic_last_updated_activity'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:54
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('forums', '0008_task_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TopicReadState',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_read_post_id', models.PositiveIntegerField()),
+                ('topic', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='forums.topic')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='BoardReadMark',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_read_post_id', models.PositiveIntegerField()),
+                ('board', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='forums.board')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='topicreadstate',
+            constraint=models.UniqueConstraint(fields=('user', 'topic'), name='forums_topicreadstate_user_topic'),
+        ),
+        migrations.AddConstraint(
+            model_name='boardreadmark',
+            constraint=models.UniqueConstraint(fields=('user', 'board'), name='forums_boardreadmark_user_board'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forums', '0009_read_tracking'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='message_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='render_version',
+            field=models.CharField(blank=True, editable=False, max_length=40),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:07
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forums', '0010_post_message_html'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedTopic',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('subject', models.CharField(max_length=256)),
+                ('board_id', models.IntegerField(db_index=True)),
+                ('starter_id', models.IntegerField()),
+                ('last_updated', models.DateTimeField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('reply_count', models.PositiveIntegerField(default=0)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedPost',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('message_zlib', models.BinaryField()),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(null=True)),
+                ('created_by_id', models.IntegerField(db_index=True)),
+                ('updated_by_id', models.IntegerField(null=True)),
+                ('topic', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='posts', to='forums.archivedtopic')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['topic', 'created_at', 'id'], name='forums_archivedpost_topic')],
+            },
+        ),
+    ]
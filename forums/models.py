@@ -1,12 +1,61 @@
+import zlib
+
 from django.conf import settings
 from django.db import models
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce, Greatest
 from django.urls import reverse
+from django.utils.safestring import mark_safe
 from django.utils.text import Truncator
 
+from . import rendering
+
+
+def count_subquery(queryset, field):
+    return Coalesce(Subquery(
+        queryset.order_by().values(field).annotate(count=Count('pk')).values('count')
+    ), 0)
+
+
+class BoardQuerySet(models.QuerySet):
+    def refresh_counters(self):
+        from .archive import add_archived_counts
+
+        posts = Post.objects.filter(topic__board=OuterRef('pk'))
+        count = self.update(
+            posts_count=count_subquery(posts, 'topic__board'),
+            topics_count=count_subquery(Topic.objects.filter(board=OuterRef('pk')), 'board'),
+            last_post=Subquery(posts.order_by('-created_at', '-pk').values('pk')[:1]),
+        )
+        add_archived_counts(self)
+        return count
+
+
+class TopicQuerySet(models.QuerySet):
+    def refresh_counters(self):
+        posts = Post.objects.filter(topic=OuterRef('pk'))
+        latest = posts.annotate(activity=Coalesce('updated_at', 'created_at')).order_by('-activity', '-pk')
+        return self.update(
+            reply_count=Greatest(count_subquery(posts, 'topic') - 1, 0),
+            last_updated=Coalesce(Subquery(latest.values('activity')[:1]), 'last_updated'),
+            last_poster=Subquery(latest.values(user=Coalesce('updated_by', 'created_by'))[:1]),
+        )
+
 
 class Board(models.Model):
     name = models.CharField(max_length=30, unique=True)
     description = models.CharField(max_length=100)
+    posts_count = models.PositiveIntegerField(default=0)
+    topics_count = models.PositiveIntegerField(default=0)
+    last_post = models.ForeignKey(
+        'Post',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+    )
+
+    objects = BoardQuerySet.as_manager()
 
     def __str__(self):
         return self.name
@@ -14,12 +63,6 @@ class Board(models.Model):
     def get_absolute_url(self):
         return reverse('board_topics', args=[self.pk])
 
-    def get_posts_count(self):
-        return Post.objects.filter(topic__board=self).count()
-
-    def get_last_post(self):
-        return Post.objects.filter(topic__board=self).order_by('-created_at').first()
-
 
 class Topic(models.Model):
     subject = models.CharField(max_length=256)
@@ -35,6 +78,21 @@ class Topic(models.Model):
         related_name='topics',
     )
     views = models.PositiveIntegerField(default=0)
+    reply_count = models.PositiveIntegerField(default=0)
+    last_poster = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+    )
+
+    objects = TopicQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['board', '-last_updated', '-id'], name='forums_topic_board_recent'),
+        ]
 
     def __str__(self):
         return self.subject
@@ -48,6 +106,8 @@ class Topic(models.Model):
 
 class Post(models.Model):
     message = models.TextField(max_length=4000)
+    message_html = models.TextField(blank=True, editable=False)
+    render_version = models.CharField(max_length=40, blank=True, editable=False)
     topic = models.ForeignKey(
         Topic,
         on_delete=models.CASCADE,
@@ -67,6 +127,174 @@ class Post(models.Model):
         related_name='+',
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['topic', 'created_at', 'id'], name='forums_post_topic_created'),
+        ]
+
     def __str__(self):
         truncated = Truncator(self.message)
         return truncated.chars(30)
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'message' in update_fields:
+            self.render_message()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'message_html', 'render_version'}
+        super().save(*args, **kwargs)
+
+    def render_message(self):
+        self.message_html = rendering.render(self.message)
+        self.render_version = rendering.version()
+
+    def get_message_html(self):
+        # Posts stored by an older renderer are rendered again for display,
+        # but only written back by the rerender_posts command.
+        if self.render_version != rendering.version():
+            return mark_safe(rendering.render(self.message))
+        return mark_safe(self.message_html)
+
+    @property
+    def html_version(self):
+        """The renderer version of get_message_html(), for cache keys."""
+        return rendering.version()
+
+
+class Task(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (FAILED, 'Failed'),
+    )
+
+    name = models.CharField(max_length=100)
+    args = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    dedup_key = models.CharField(max_length=200, null=True, blank=True)
+    run_after = models.DateTimeField()
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='forums_task_status_run_after'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dedup_key'],
+                condition=Q(status='pending'),
+                name='forums_task_pending_dedup',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.name}{tuple(self.args)}'
+
+
+class TopicReadState(models.Model):
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    topic = models.ForeignKey(
+        Topic,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    last_read_post_id = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'topic'], name='forums_topicreadstate_user_topic'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id} read {self.topic_id} up to {self.last_read_post_id}'
+
+
+class BoardReadMark(models.Model):
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    board = models.ForeignKey(
+        Board,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    last_read_post_id = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'board'], name='forums_boardreadmark_user_board'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id} read {self.board_id} up to {self.last_read_post_id}'
+
+
+class ArchivedTopic(models.Model):
+    """
+    A topic moved out of the hot tables by ``forums.archive``. It keeps its
+    id, and refers to boards and users by id only, because the archive may
+    live in a database of its own.
+    """
+    id = models.IntegerField(primary_key=True)
+    subject = models.CharField(max_length=256)
+    board_id = models.IntegerField(db_index=True)
+    starter_id = models.IntegerField()
+    last_updated = models.DateTimeField()
+    views = models.PositiveIntegerField(default=0)
+    reply_count = models.PositiveIntegerField(default=0)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.subject
+
+
+class ArchivedPost(models.Model):
+    """An archived post, with its message stored zlib-compressed."""
+    archived = True
+
+    id = models.IntegerField(primary_key=True)
+    topic = models.ForeignKey(
+        ArchivedTopic,
+        on_delete=models.CASCADE,
+        related_name='posts',
+    )
+    message_zlib = models.BinaryField()
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField(null=True)
+    created_by_id = models.IntegerField(db_index=True)
+    updated_by_id = models.IntegerField(null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['topic', 'created_at', 'id'], name='forums_archivedpost_topic'),
+        ]
+
+    def __str__(self):
+        return Truncator(self.message).chars(30)
+
+    @property
+    def message(self):
+        return zlib.decompress(self.message_zlib).decode()
+
+    @message.setter
+    def message(self, value):
+        self.message_zlib = zlib.compress(value.encode(), 9)
+
+    @property
+    def html_version(self):
+        return rendering.version()
+
+    def get_message_html(self):
+        return mark_safe(rendering.render(self.message))
@@ -0,0 +1,212 @@
+"""
+Bulk moderation: deleting, moving and merging topics, and purging spam
+accounts.
+
+Deleting through the ORM loads every row and sends its signals one at a
+time, which takes minutes for a long topic or a spammer's history. These
+functions work on sets of rows instead, a batch per transaction, so no
+single transaction holds the database for long. They then recount the
+affected topics, boards and users, and update the search index and page
+caches that the signals would otherwise keep in sync.
+"""
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F, OuterRef, Sum
+from django.db.models.functions import Greatest
+
+from . import caching, search
+from .models import (
+    ArchivedPost, ArchivedTopic, Board, BoardReadMark, Post, Topic, TopicReadState, count_subquery,
+)
+from .routers import archive_alias
+
+
+def raw_delete(queryset):
+    """Delete with a single statement: no signals, and no cascades."""
+    return queryset._raw_delete(queryset.db)
+
+
+def refresh_boards(board_ids):
+    Board.objects.filter(pk__in=board_ids).refresh_counters()
+    transaction.on_commit(partial(caching.bump, 'boards', *(f'board:{pk}' for pk in board_ids)))
+
+
+def pk_batches(queryset, batch_size):
+    """
+    Lists of up to ``batch_size`` pks from ``queryset``, read again before
+    each batch. The caller has to move every batch out of ``queryset``.
+    """
+    queryset = queryset.order_by('pk').values_list('pk', flat=True)
+    while True:
+        pks = list(queryset[:batch_size])
+        if not pks:
+            return
+        yield pks
+
+
+def delete_posts(posts, batch_size=1000, log=None):
+    """Delete the posts in ``posts``, ``batch_size`` at a time. Returns the number deleted."""
+    log = log or (lambda message: None)
+    deleted = 0
+    board_ids = set()
+    for pks in pk_batches(posts, batch_size):
+        rows = list(Post.objects.filter(pk__in=pks).values_list('topic', 'topic__board', 'created_by'))
+        topic_ids = {topic_id for topic_id, board_id, user_id in rows}
+        with transaction.atomic():
+            # The ORM nulls these before deleting; a raw delete has to do it by hand.
+            Board.objects.filter(last_post__in=pks).update(last_post=None)
+            raw_delete(Post.objects.filter(pk__in=pks))
+            search.get_backend().remove_posts(pks)
+            Topic.objects.filter(pk__in=topic_ids).refresh_counters()
+            get_user_model().objects.filter(pk__in={user_id for topic_id, board_id, user_id in rows}).refresh_counters()
+        caching.bump(*(f'topic:{pk}' for pk in topic_ids))
+        deleted += len(pks)
+        board_ids.update(board_id for topic_id, board_id, user_id in rows)
+        log(f'Deleted {deleted} posts.')
+    refresh_boards(board_ids)
+    return deleted
+
+
+def delete_topics(topics, batch_size=100, log=None):
+    """
+    Delete the topics in ``topics`` with all their posts, ``batch_size``
+    topics at a time. Returns the number of topics deleted.
+    """
+    log = log or (lambda message: None)
+    deleted = 0
+    board_ids = set()
+    for pks in pk_batches(topics, batch_size):
+        posts = Post.objects.filter(topic__in=pks)
+        post_rows = list(posts.values_list('pk', 'created_by'))
+        with transaction.atomic():
+            board_ids.update(Topic.objects.filter(pk__in=pks).values_list('board', flat=True))
+            Board.objects.filter(last_post__topic__in=pks).update(last_post=None)
+            raw_delete(posts)
+            raw_delete(TopicReadState.objects.filter(topic__in=pks))
+            raw_delete(Topic.objects.filter(pk__in=pks))
+            backend = search.get_backend()
+            backend.remove_posts([pk for pk, user_id in post_rows])
+            backend.remove_topics(pks)
+            get_user_model().objects.filter(pk__in={user_id for pk, user_id in post_rows}).refresh_counters()
+        caching.bump(*(f'topic:{pk}' for pk in pks))
+        deleted += len(pks)
+        log(f'Deleted {deleted} topics.')
+    refresh_boards(board_ids)
+    return deleted
+
+
+def move_topics(topics, board):
+    """Move the topics in ``topics`` to ``board``. Their posts stay where they are."""
+    rows = list(topics.values_list('pk', 'board'))
+    pks = [pk for pk, board_id in rows]
+    with transaction.atomic():
+        moved = Topic.objects.filter(pk__in=pks).exclude(board=board).update(board=board)
+        refresh_boards({board.pk} | {board_id for pk, board_id in rows})
+    caching.bump(*(f'topic:{pk}' for pk in pks))
+    return moved
+
+
+def merge_topics(target, sources, batch_size=1000, log=None):
+    """
+    Move every post of the ``sources`` topics into ``target``, ``batch_size``
+    at a time, then delete the emptied sources. Posts keep their ids and
+    timestamps, so they interleave with the target's posts by date. Returns
+    the number of posts moved.
+    """
+    log = log or (lambda message: None)
+    source_pks = list(sources.exclude(pk=target.pk).values_list('pk', flat=True))
+    if not source_pks:
+        return 0
+    board_ids = {target.board_id, *Topic.objects.filter(pk__in=source_pks).values_list('board', flat=True)}
+    moved = 0
+    for pks in pk_batches(Post.objects.filter(topic__in=source_pks), batch_size):
+        with transaction.atomic():
+            Post.objects.filter(pk__in=pks).update(topic=target)
+        moved += len(pks)
+        log(f'Moved {moved} posts.')
+    with transaction.atomic():
+        views = Topic.objects.filter(pk__in=source_pks).aggregate(views=Sum('views'))['views'] or 0
+        Topic.objects.filter(pk=target.pk).update(views=F('views') + views)
+        # Read positions in the sources say nothing about the merged topic.
+        raw_delete(TopicReadState.objects.filter(topic__in=source_pks))
+        raw_delete(Topic.objects.filter(pk__in=source_pks))
+        search.get_backend().remove_topics(source_pks)
+        Topic.objects.filter(pk=target.pk).refresh_counters()
+        refresh_boards(board_ids)
+    caching.bump(f'topic:{target.pk}', *(f'topic:{pk}' for pk in source_pks))
+    return moved
+
+
+def delete_archived(user, batch_size=1000, log=None):
+    """
+    Delete the archived topics ``user`` started, with every reply in them,
+    and their archived posts in other topics. Returns the numbers of topics
+    and posts deleted.
+    """
+    log = log or (lambda message: None)
+    board_ids = set()
+    user_ids = {user.pk}
+    topics = 0
+    for pks in pk_batches(ArchivedTopic.objects.filter(starter_id=user.pk), max(batch_size // 10, 1)):
+        posts = ArchivedPost.objects.filter(topic__in=pks)
+        with transaction.atomic(using=archive_alias()):
+            board_ids.update(ArchivedTopic.objects.filter(pk__in=pks).values_list('board_id', flat=True))
+            user_ids.update(posts.values_list('created_by_id', flat=True))
+            raw_delete(posts)
+            raw_delete(ArchivedTopic.objects.filter(pk__in=pks))
+        caching.bump(*(f'topic:{pk}' for pk in pks))
+        topics += len(pks)
+        log(f'Deleted {topics} archived topics.')
+    posts = 0
+    for pks in pk_batches(ArchivedPost.objects.filter(created_by_id=user.pk), batch_size):
+        rows = list(ArchivedPost.objects.filter(pk__in=pks).values_list('topic', 'topic__board_id'))
+        with transaction.atomic(using=archive_alias()):
+            raw_delete(ArchivedPost.objects.filter(pk__in=pks))
+            ArchivedTopic.objects.filter(pk__in={topic_id for topic_id, board_id in rows}).update(
+                reply_count=Greatest(count_subquery(ArchivedPost.objects.filter(topic=OuterRef('pk')), 'topic') - 1, 0),
+            )
+        caching.bump(*{f'topic:{topic_id}' for topic_id, board_id in rows})
+        board_ids.update(board_id for topic_id, board_id in rows)
+        posts += len(pks)
+        log(f'Deleted {posts} archived posts.')
+    with transaction.atomic():
+        get_user_model().objects.filter(pk__in=user_ids).refresh_counters()
+        refresh_boards(board_ids)
+    return topics, posts
+
+
+def purge_user(user, delete_account=False, batch_size=1000, log=None):
+    """
+    Remove everything ``user`` wrote: the topics they started, with every
+    reply in them, and their posts in other topics, archived or not. Their
+    edits to other people's posts are kept. The account is deactivated, or deleted with
+    ``delete_account``. Returns the numbers of topics and posts deleted.
+    """
+    log = log or (lambda message: None)
+    edited = Post.objects.filter(updated_by=user)
+    topic_ids = set(edited.values_list('topic', flat=True))
+    with transaction.atomic():
+        edited.update(updated_by=None)
+        Topic.objects.filter(pk__in=topic_ids).refresh_counters()
+    caching.bump(*(f'topic:{pk}' for pk in topic_ids))
+    edited = ArchivedPost.objects.filter(updated_by_id=user.pk)
+    topic_ids = set(edited.values_list('topic', flat=True))
+    with transaction.atomic(using=archive_alias()):
+        edited.update(updated_by_id=None)
+    caching.bump(*(f'topic:{pk}' for pk in topic_ids))
+    topics = delete_topics(Topic.objects.filter(starter=user), max(batch_size // 10, 1), log)
+    posts = delete_posts(Post.objects.filter(created_by=user), batch_size, log)
+    archived_topics, archived_posts = delete_archived(user, batch_size, log)
+    topics += archived_topics
+    posts += archived_posts
+    with transaction.atomic():
+        raw_delete(TopicReadState.objects.filter(user=user))
+        raw_delete(BoardReadMark.objects.filter(user=user))
+        if delete_account:
+            user.delete()
+        else:
+            user.is_active = False
+            user.save(update_fields=['is_active'])
+    return topics, posts
@@ -0,0 +1,199 @@
+"""
+Keyset (cursor) pagination.
+
+Instead of ``COUNT(*)`` and ``OFFSET n`` every page is fetched with a range
+condition on the ordering columns, so deep pages cost the same as the first.
+
+``EstimatedCountPaginator`` keeps page numbers but takes the size of an
+unfiltered large table from the database's statistics.
+"""
+import base64
+import binascii
+import datetime
+import json
+from functools import reduce
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections, transaction
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.http import Http404
+
+
+def encode_cursor(values, direction):
+    values = [value.isoformat() if isinstance(value, datetime.datetime) else value for value in values]
+    data = json.dumps({'k': values, 'd': direction}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return data['k'], data['d']
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise Http404('Invalid cursor.')
+
+
+class KeysetPage:
+    cursor_paginated = True
+
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<Keyset page of {len(self.object_list)} objects>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    def __init__(self, queryset, per_page, ordering):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = ordering
+        self.fields = [name.lstrip('-') for name in ordering]
+
+    def _key(self, obj):
+        return [getattr(obj, name) for name in self.fields]
+
+    def cursor_for(self, obj, direction='next'):
+        """
+        Cursor for the page that starts right after ``obj`` (``'next'``), ends
+        right before it (``'previous'``) or starts with it (``'start'``).
+        """
+        return encode_cursor(self._key(obj), direction)
+
+    def _after(self, values, reverse, inclusive=False):
+        # Lexicographic comparison: (a, b) > (x, y) is a > x OR (a = x AND b > y).
+        clauses = []
+        for i, (name, value) in enumerate(zip(self.ordering, values)):
+            descending = name.startswith('-') != reverse
+            lookup = f'{name.lstrip("-")}__{"lt" if descending else "gt"}'
+            if inclusive and i == len(values) - 1:
+                lookup += 'e'
+            equal = {field: values[j] for j, field in enumerate(self.fields[:i])}
+            clauses.append(Q(**equal, **{lookup: value}))
+        return reduce(lambda left, right: left | right, clauses)
+
+    def _decode(self, cursor):
+        values, direction = decode_cursor(cursor)
+        if direction not in ('next', 'previous', 'start') or len(values) != len(self.fields):
+            raise Http404('Invalid cursor.')
+        model = self.queryset.model
+        try:
+            values = [model._meta.get_field(name).to_python(value) for name, value in zip(self.fields, values)]
+        except Exception:
+            raise Http404('Invalid cursor.')
+        return values, direction
+
+    def _query(self, cursor):
+        values, direction = self._decode(cursor) if cursor else (None, 'next')
+        reverse = direction == 'previous'
+        ordering = [name[1:] if name.startswith('-') else f'-{name}' for name in self.ordering] if reverse \
+            else list(self.ordering)
+        queryset = self.queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self._after(values, reverse, inclusive=direction == 'start'))
+        return queryset[:self.per_page + 1], values, reverse
+
+    def _make_page(self, objects, values, reverse):
+        has_more = len(objects) > self.per_page
+        objects = objects[:self.per_page]
+        if reverse:
+            objects.reverse()
+        if not objects:
+            return KeysetPage(objects, self)
+
+        next_cursor = previous_cursor = None
+        if has_more or reverse:
+            next_cursor = self.cursor_for(objects[-1], 'next')
+        if (has_more and reverse) or (values is not None and not reverse):
+            previous_cursor = self.cursor_for(objects[0], 'previous')
+        return KeysetPage(objects, self, next_cursor, previous_cursor)
+
+    def page(self, cursor=None):
+        queryset, values, reverse = self._query(cursor)
+        return self._make_page(list(queryset), values, reverse)
+
+
+class KeysetPaginationMixin:
+    """
+    ListView mixin that pages with ``?cursor=`` over ``keyset_ordering`` when
+    ``settings.FORUMS_PAGINATION`` is ``'keyset'``.
+    """
+    keyset_ordering = None
+
+    def get_pagination_mode(self):
+        return getattr(settings, 'FORUMS_PAGINATION', 'offset')
+
+    def paginate_queryset(self, queryset, page_size):
+        if self.get_pagination_mode() != 'keyset':
+            return super().paginate_queryset(queryset, page_size)
+        paginator = KeysetPaginator(queryset, page_size, self.keyset_ordering)
+        page = paginator.page(self.request.GET.get('cursor'))
+        return paginator, page, page.object_list, page.has_other_pages()
+
+
+def estimated_count(model, using='default'):
+    """
+    The row count the query planner has on record for a model's table, or
+    None when the database has no statistics for it.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    try:
+        with transaction.atomic(using=using), connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+            elif connection.vendor == 'sqlite':
+                # Filled in by ANALYZE; the first number of each row is the table's row count.
+                cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table])
+            else:
+                return None
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    if row is None:
+        return None
+    estimate = int(str(row[0]).split()[0])
+    # PostgreSQL reports -1 for a table that has never been analyzed.
+    return estimate if estimate >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that doesn't run ``COUNT(*)`` over a whole table of at least
+    ``exact_below`` rows. Filtered querysets are still counted exactly. The
+    estimate can be off by a few percent, so the last page may come up
+    short or empty.
+    """
+    exact_below = 10000
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is not None and not query.where:
+            estimate = estimated_count(self.object_list.model, self.object_list.db)
+            if estimate is not None and estimate >= self.exact_below:
+                return estimate
+        return super().count
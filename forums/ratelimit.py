@@ -0,0 +1,214 @@
+"""
+Token-bucket rate limiting for write endpoints.
+
+Each endpoint ("scope") can have a limit per signed-in user and one per client
+IP, written as ``'<count>/<period>'`` such as ``'5/10m'``. A bucket holds up to
+``count`` tokens and refills at ``count`` per period. Buckets live in the
+Django cache, and each update holds a lock taken with ``cache.add`` so two
+requests can't spend the same token. If the cache fails, an in-process store
+takes over.
+
+Workers only share buckets, and the lock only holds across them, when the
+cache is shared and its ``add`` is atomic: Redis or Memcached. The default
+file cache is shared by the processes on one host, but its ``add`` is not
+atomic, so two requests arriving together can now and then spend the same
+token. With ``LocMemCache`` every process has its own buckets, so a client
+can get up to one limit per worker process.
+"""
+import math
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.shortcuts import render
+
+DEFAULTS = {
+    'ENABLED': True,
+    'IP_HEADER': None,  # e.g. 'HTTP_X_FORWARDED_FOR' behind a trusted proxy
+    'RATES': {},
+    'LOCK_WAIT': 1,  # Seconds to wait for a bucket's lock before refusing the request
+}
+
+LOCK_TIMEOUT = 5
+
+UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+limited_counts = Counter()
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'FORUMS_RATELIMIT', {})}
+
+
+def parse_rate(rate):
+    count, period = rate.split('/')
+    match = re.fullmatch(r'(\d*)([smhd])', period)
+    if not match:
+        raise ValueError(f'Invalid rate: {rate!r}')
+    return int(count), int(match.group(1) or 1) * UNITS[match.group(2)]
+
+
+class LocalStore:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.data = {}
+
+    def get(self, key):
+        with self.lock:
+            value, expires = self.data.get(key, (None, 0))
+            return value if expires > time.monotonic() else None
+
+    def set(self, key, value, timeout):
+        with self.lock:
+            self.data[key] = (value, time.monotonic() + timeout)
+
+    def add(self, key, value, timeout):
+        with self.lock:
+            if self.data.get(key, (None, 0))[1] > time.monotonic():
+                return False
+            self.data[key] = (value, time.monotonic() + timeout)
+            return True
+
+    def delete(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+
+
+class CacheStore:
+    """The Django cache, falling back to process memory while the cache is unavailable."""
+
+    def __init__(self):
+        self.fallback = LocalStore()
+
+    def get(self, key):
+        try:
+            return cache.get(key)
+        except Exception:
+            return self.fallback.get(key)
+
+    def set(self, key, value, timeout):
+        try:
+            cache.set(key, value, timeout)
+        except Exception:
+            self.fallback.set(key, value, timeout)
+
+    def add(self, key, value, timeout):
+        try:
+            return cache.add(key, value, timeout)
+        except Exception:
+            return self.fallback.add(key, value, timeout)
+
+    def delete(self, key):
+        try:
+            cache.delete(key)
+        except Exception:
+            self.fallback.delete(key)
+
+
+store = CacheStore()
+
+
+@contextmanager
+def locked(key):
+    """Hold the lock on ``key``'s bucket; yields False if it couldn't be taken in time."""
+    lock_key = f'{key}:lock'
+    deadline = time.monotonic() + get_config()['LOCK_WAIT']
+    acquired = store.add(lock_key, 1, LOCK_TIMEOUT)
+    while not acquired and time.monotonic() < deadline:
+        time.sleep(0.005)
+        acquired = store.add(lock_key, 1, LOCK_TIMEOUT)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            store.delete(lock_key)
+
+
+def consume(key, rate, now=None):
+    """Take a token from the bucket; return 0 if allowed, otherwise seconds until a token is available."""
+    capacity, period = parse_rate(rate)
+    with locked(key) as acquired:
+        if not acquired:
+            # Requests are queueing on this bucket; refuse rather than risk spending a token twice.
+            return period / capacity
+        return take_token(key, capacity, period, time.time() if now is None else now)
+
+
+def take_token(key, capacity, period, now):
+    tokens, updated = store.get(key) or (capacity, now)
+    tokens = min(capacity, tokens + (now - updated) * capacity / period)
+    if tokens >= 1:
+        store.set(key, (tokens - 1, now), period)
+        return 0
+    store.set(key, (tokens, now), period)
+    return (1 - tokens) * period / capacity
+
+
+def client_ip(request):
+    header = get_config()['IP_HEADER']
+    if header and request.META.get(header):
+        return request.META[header].split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def record_limited(scope, kind):
+    limited_counts[(scope, kind)] += 1
+    key = f'forums:ratelimit:limited:{scope}:{kind}'
+    try:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+    except Exception:
+        pass
+
+
+def get_limited_counts():
+    counts = {}
+    for scope, limits in get_config()['RATES'].items():
+        for kind in limits:
+            try:
+                count = cache.get(f'forums:ratelimit:limited:{scope}:{kind}')
+            except Exception:
+                count = None
+            counts[(scope, kind)] = count if count is not None else limited_counts[(scope, kind)]
+    return counts
+
+
+def check(request, scope):
+    """Return the number of seconds to wait if ``request`` is over any limit of ``scope``, else 0."""
+    config = get_config()
+    limits = config['RATES'].get(scope, {})
+    if not config['ENABLED'] or not limits:
+        return 0
+    identities = {'ip': client_ip(request)}
+    if request.user.is_authenticated:
+        identities['user'] = request.user.pk
+    wait = 0
+    for kind, rate in limits.items():
+        if kind not in identities:
+            continue
+        retry_after = consume(f'forums:ratelimit:{scope}:{kind}:{identities[kind]}', rate)
+        if retry_after:
+            record_limited(scope, kind)
+            wait = max(wait, retry_after)
+    return wait
+
+
+def ratelimit(scope, methods=('POST',)):
+    """Decorate a view so ``methods`` requests over the ``scope`` limits get a 429 response."""
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if request.method in methods:
+                wait = check(request, scope)
+                if wait:
+                    response = render(request, '429.html', {'retry_after': math.ceil(wait)}, status=429)
+                    response['Retry-After'] = str(math.ceil(wait))
+                    return response
+            return view(request, *args, **kwargs)
+        return wrapped
+    return decorator
@@ -0,0 +1,121 @@
+"""
+Which posts each user has read.
+
+Reading is tracked as a post id watermark: everything up to and including
+``last_read_post_id`` counts as read. Post ids only grow, so one integer per
+topic is enough. "Mark all read" on a board stores a single watermark for
+the whole board and drops the per-topic rows it makes redundant. A topic's
+watermark is the higher of its own and its board's.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from . import caching
+from .models import BoardReadMark, Post, Topic, TopicReadState, count_subquery
+from .pagination import KeysetPaginator
+
+
+def reads_scope(user):
+    """Cache scope for pages that show the user's read state."""
+    return f'reads:{user.pk}'
+
+
+def topic_watermark(user, topic_ref):
+    return Subquery(
+        TopicReadState.objects.filter(user=user, topic=topic_ref).values('last_read_post_id')[:1]
+    )
+
+
+def watermark(user, topic_ref, board_ref):
+    """Expression for the last post the user has read in the referenced topic."""
+    board_read = BoardReadMark.objects.filter(user=user, board=board_ref).values('last_read_post_id')[:1]
+    return Greatest(
+        Coalesce(topic_watermark(user, topic_ref), Value(0)),
+        Coalesce(Subquery(board_read), Value(0)),
+    )
+
+
+def with_read_state(queryset, user):
+    """
+    Annotate topics with the user's ``topic_read_post_id`` (None without a row
+    of its own) and ``last_read_post_id`` (including the board's watermark).
+    """
+    if not user.is_authenticated:
+        return queryset
+    return queryset.annotate(
+        topic_read_post_id=topic_watermark(user, OuterRef('pk')),
+        last_read_post_id=watermark(user, OuterRef('pk'), OuterRef('board')),
+    )
+
+
+def unread_counts(user, topics):
+    """Unread post counts by topic id for the given topics, in a single query."""
+    if not user.is_authenticated or not topics:
+        return {}
+    unread = Post.objects.filter(
+        topic=OuterRef('pk'),
+        pk__gt=watermark(user, OuterRef('topic'), OuterRef(OuterRef('board'))),
+    )
+    return dict(
+        Topic.objects.filter(pk__in=[topic.pk for topic in topics])
+        .annotate(unread=count_subquery(unread, 'topic'))
+        .filter(unread__gt=0)
+        .values_list('pk', 'unread')
+    )
+
+
+def first_unread(topic):
+    """
+    The first post the user hasn't read in a topic from with_read_state(),
+    found with a seek on the post id index.
+    """
+    return Post.objects.filter(topic=topic, pk__gt=topic.last_read_post_id).order_by('pk').first()
+
+
+def first_unread_url(topic, per_page, ordering):
+    """
+    URL of the thread page that starts at the first unread post, or at the
+    last post when everything has been read.
+    """
+    post = first_unread(topic) or topic.posts.order_by('-pk').first()
+    url = topic.get_absolute_url()
+    if post is None:
+        return url
+    if getattr(settings, 'FORUMS_PAGINATION', 'offset') == 'keyset':
+        url += f'?cursor={KeysetPaginator(topic.posts.all(), per_page, ordering).cursor_for(post, "start")}'
+    else:
+        url += f'?page={topic.posts.filter(pk__lt=post.pk).count() // per_page + 1}'
+    return f'{url}#post-{post.pk}'
+
+
+def mark_read(user, topic, post_id):
+    """
+    Move the user's watermark in a topic from with_read_state() forward to
+    ``post_id``. Costs one query when it moves and none when it doesn't.
+    """
+    if post_id <= topic.last_read_post_id:
+        return
+    if topic.topic_read_post_id is None:
+        TopicReadState.objects.bulk_create(
+            [TopicReadState(user=user, topic=topic, last_read_post_id=post_id)], ignore_conflicts=True,
+        )
+    else:
+        TopicReadState.objects.filter(
+            user=user, topic=topic, last_read_post_id__lt=post_id,
+        ).update(last_read_post_id=post_id)
+    topic.topic_read_post_id = topic.last_read_post_id = post_id
+    caching.bump(reads_scope(user))
+
+
+def mark_board_read(user, board):
+    last_post_id = Post.objects.aggregate(last=Max('pk'))['last'] or 0
+    with transaction.atomic():
+        BoardReadMark.objects.update_or_create(
+            user=user, board=board, defaults={'last_read_post_id': last_post_id},
+        )
+        TopicReadState.objects.filter(
+            user=user, topic__board=board, last_read_post_id__lte=last_post_id,
+        ).delete()
+    caching.bump(reads_scope(user))
@@ -0,0 +1,123 @@
+"""
+Post formatting.
+
+Messages are written in Markdown and rendered to sanitized HTML when a post
+is saved. The HTML is stored on the post together with the version of the
+renderer that produced it, so showing a post never runs the parser. Posts
+rendered by another version are rendered again each time they are shown,
+without writing to the database, until the ``rerender_posts`` command
+stores their new HTML; the ``release`` step in the ``Procfile`` runs it,
+after the migrations, on every deploy. Bump ``RENDERER_VERSION`` whenever
+the output for the same message changes.
+
+With the ``markdown`` and ``nh3`` packages installed, messages get full
+Markdown, cleaned down to ``ALLOWED_TAGS``. Without them a small built-in
+renderer handles paragraphs, line breaks, emphasis, inline and fenced code
+and links. It escapes the message before adding any markup. The renderer in
+use is part of the version, so installing the packages re-renders every
+post.
+"""
+import re
+
+from django.utils.html import escape
+
+try:
+    import markdown
+    import nh3
+except ImportError:
+    markdown = nh3 = None
+
+RENDERER_VERSION = 1
+
+ALLOWED_TAGS = {
+    'a', 'blockquote', 'br', 'code', 'del', 'em', 'h3', 'h4', 'h5', 'h6', 'hr',
+    'li', 'ol', 'p', 'pre', 'strong', 'ul',
+}
+ALLOWED_ATTRIBUTES = {'a': {'href', 'title'}}
+LINK_REL = 'nofollow ugc'
+
+FENCE = re.compile(r'^```[^\n]*\n(.*?)^```[ \t]*$', re.MULTILINE | re.DOTALL)
+CODE_SPAN = re.compile(r'`([^`\n]+)`')
+INLINE_RULES = (
+    (re.compile(r'\[([^\]\n]+)\]\((https?://[^\s)]+)\)'), rf'<a href="\2" rel="{LINK_REL}">\1</a>'),
+    (re.compile(r'\*\*(?=\S)(.+?)(?<=\S)\*\*'), r'<strong>\1</strong>'),
+    (re.compile(r'(?<![\w*])\*(?=\S)(.+?)(?<=\S)\*(?![\w*])'), r'<em>\1</em>'),
+    (re.compile(r'(?<!\w)_(?=\S)(.+?)(?<=\S)_(?!\w)'), r'<em>\1</em>'),
+)
+
+
+def version():
+    return f'{RENDERER_VERSION}:{"markdown" if markdown else "basic"}'
+
+
+def render_inline(text):
+    parts = CODE_SPAN.split(escape(text))
+    # Odd parts were inside backticks and are left as they are.
+    for index in range(0, len(parts), 2):
+        for pattern, replacement in INLINE_RULES:
+            parts[index] = pattern.sub(replacement, parts[index])
+    for index in range(1, len(parts), 2):
+        parts[index] = f'<code>{parts[index]}</code>'
+    return '<br>\n'.join(''.join(parts).splitlines())
+
+
+def render_basic(text):
+    blocks = []
+    position = 0
+    for fence in FENCE.finditer(text):
+        blocks.extend(paragraphs(text[position:fence.start()]))
+        blocks.append(f'<pre><code>{escape(fence.group(1))}</code></pre>')
+        position = fence.end()
+    blocks.extend(paragraphs(text[position:]))
+    return '\n'.join(blocks)
+
+
+def paragraphs(text):
+    return [f'<p>{render_inline(block.strip())}</p>' for block in re.split(r'\n\s*\n', text) if block.strip()]
+
+
+def render(text):
+    """Sanitized HTML for a Markdown message."""
+    text = text.replace('\r\n', '\n')
+    if markdown is None:
+        return render_basic(text)
+    html = markdown.markdown(text, extensions=['fenced_code', 'sane_lists', 'nl2br'])
+    return nh3.clean(
+        html,
+        tags=ALLOWED_TAGS,
+        attributes=ALLOWED_ATTRIBUTES,
+        url_schemes={'http', 'https', 'mailto'},
+        link_rel=LINK_REL,
+    )
+
+
+def refresh(posts):
+    """
+    Re-render and store those of ``posts`` that an older renderer produced,
+    in one query. Returns how many there were. Pages never call this: the
+    GET path stays read-only, so it can be served from a read replica.
+    """
+    current = version()
+    stale = [post for post in posts if post.render_version != current]
+    for post in stale:
+        post.render_message()
+    if stale:
+        type(stale[0]).objects.bulk_update(stale, ['message_html', 'render_version'])
+    return len(stale)
+
+
+def rerender_posts(batch_size=1000, log=None):
+    """Re-render every post that an older renderer produced. Returns how many there were."""
+    from .models import Post
+
+    log = log or (lambda message: None)
+    stale = Post.objects.exclude(render_version=version()).order_by('pk')
+    last_pk = 0
+    rendered = 0
+    while True:
+        batch = list(stale.filter(pk__gt=last_pk).only('message', 'render_version')[:batch_size])
+        if not batch:
+            return rendered
+        rendered += refresh(batch)
+        last_pk = batch[-1].pk
+        log(f'Rendered {rendered} posts.')
@@ -0,0 +1,119 @@
+"""
+Read replicas.
+
+Every database alias named ``replica...`` in ``settings.DATABASES`` is a
+read-only copy of ``default``. ``routers.ReplicaRouter`` spreads reads of
+boards, topics and posts over them. Writes, and reads of everything else
+(users, sessions, read tracking, the task queue), go to ``default``.
+
+A request reads from ``default`` only when it has to:
+
+* unsafe methods (POST, PUT, ...) always use it, so a view that writes
+  reads what it is about to change from the primary;
+* a browser that just wrote something gets a cookie that pins its
+  requests to ``default`` for ``PIN_SECONDS``, so a new reply shows up
+  even when the replicas are behind;
+* reads inside ``transaction.atomic()`` stay on ``default``.
+
+Only ``ReplicaPinningMiddleware`` sends reads to a replica. Code outside a
+request, such as management commands and the task worker, reads from
+``default``: the batched commands re-read rows they have just changed, and
+a lagging replica would never show them gone.
+
+Each request picks its database once, so every query of a page sees the
+same point in time, and ``using_replica()`` tells whether that is a
+replica. A replica may not have caught up with a write whose cache versions
+are already bumped, so what it returns must not be stored under those
+versions: pages rendered for the page cache read from the primary inside
+``use_primary()``, and pages read from a replica get no ETag.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+DEFAULTS = {
+    'PIN_SECONDS': 10,
+    'COOKIE_NAME': 'forums_primary',
+}
+
+_alias = ContextVar('forums_read_alias', default=None)
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'FORUMS_REPLICAS', {})}
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias.startswith('replica')]
+
+
+def read_alias():
+    """The database to read boards, topics and posts from."""
+    replicas = replica_aliases()
+    if not replicas or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        return DEFAULT_DB_ALIAS
+    return _alias.get() or DEFAULT_DB_ALIAS
+
+
+def using_replica():
+    return read_alias() != DEFAULT_DB_ALIAS
+
+
+@contextmanager
+def use_primary():
+    """Read boards, topics and posts from the primary inside the block."""
+    token = _alias.set(DEFAULT_DB_ALIAS)
+    try:
+        yield
+    finally:
+        _alias.reset(token)
+
+
+class ReplicaPinningMiddleware:
+    """Send a request's reads to the primary after, and while, its browser writes."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not replica_aliases():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.config = get_config()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _alias.set(self.choose_alias(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _alias.reset(token)
+        return self.finish(request, response)
+
+    async def __acall__(self, request):
+        token = _alias.set(self.choose_alias(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _alias.reset(token)
+        return self.finish(request, response)
+
+    def choose_alias(self, request):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') or self.config['COOKIE_NAME'] in request.COOKIES:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replica_aliases())
+
+    def finish(self, request, response):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and response.status_code < 400:
+            response.set_cookie(
+                self.config['COOKIE_NAME'], '1',
+                max_age=self.config['PIN_SECONDS'], httponly=True, samesite='Lax',
+            )
+        return response
@@ -0,0 +1,69 @@
+"""
+Database routers.
+
+``ArchiveRouter`` keeps the archive tables in the ``archive`` database when
+``settings.DATABASES`` has one, and in ``default`` otherwise.
+``ReplicaRouter`` reads boards, topics and posts from the replicas described
+in ``forums.replicas``.
+"""
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+from . import replicas
+
+ARCHIVE_MODELS = {'archivedtopic', 'archivedpost'}
+REPLICATED_MODELS = {'board', 'topic', 'post'}
+
+
+def archive_alias():
+    return 'archive' if 'archive' in settings.DATABASES else 'default'
+
+
+class ArchiveRouter:
+    def is_archived(self, model):
+        return model._meta.app_label == 'forums' and model._meta.model_name in ARCHIVE_MODELS
+
+    def db_for_read(self, model, **hints):
+        if self.is_archived(model):
+            return archive_alias()
+        return None
+
+    db_for_write = db_for_read
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if self.is_archived(obj1) and self.is_archived(obj2):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if app_label == 'forums' and model_name in ARCHIVE_MODELS:
+            return db == archive_alias()
+        if db == 'archive':
+            return False
+        return None
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not replicas.replica_aliases():
+            return None
+        if model._meta.app_label == 'forums' and model._meta.model_name in REPLICATED_MODELS:
+            return replicas.read_alias()
+        # Without this, related objects would be read from the replica their parent came from.
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        if not replicas.replica_aliases():
+            return None
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *replicas.replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in replicas.replica_aliases():
+            return False
+        return None
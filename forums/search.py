@@ -0,0 +1,225 @@
+"""
+Full-text search over topic subjects and post messages.
+
+On SQLite the index is an FTS5 table kept in sync by the post and topic
+signals. Posts and topics share the table, so their rowids are interleaved:
+even rowids are posts and odd rowids are topics. Other databases fall back
+to a plain ``icontains`` scan.
+"""
+import re
+
+from django.db import connection, transaction
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+from django.utils.text import Truncator
+
+FTS_TABLE = 'forums_search'
+MARK_START, MARK_END = '\x02', '\x03'
+
+
+def post_rowid(pk):
+    return pk * 2
+
+
+def topic_rowid(pk):
+    return pk * 2 + 1
+
+
+def highlight(snippet):
+    return mark_safe(escape(snippet).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>'))
+
+
+class SearchHit:
+    def __init__(self, kind, pk, snippet=''):
+        self.kind = kind
+        self.pk = pk
+        self.snippet = snippet
+        self.topic = None
+        self.post = None
+
+    def get_absolute_url(self):
+        return self.topic.get_absolute_url()
+
+
+def hydrate(hits):
+    from .models import Post, Topic
+
+    posts = Post.objects.select_related('topic__board', 'created_by').in_bulk(
+        [hit.pk for hit in hits if hit.kind == 'post']
+    )
+    topics = Topic.objects.select_related('board', 'starter').in_bulk(
+        [hit.pk for hit in hits if hit.kind == 'topic']
+    )
+    hydrated = []
+    for hit in hits:
+        if hit.kind == 'post' and hit.pk in posts:
+            hit.post = posts[hit.pk]
+            hit.topic = hit.post.topic
+        elif hit.kind == 'topic' and hit.pk in topics:
+            hit.topic = topics[hit.pk]
+        else:
+            continue
+        hydrated.append(hit)
+    return hydrated
+
+
+class SearchResults:
+    """Lazy, sliceable result set that can be handed to Django's Paginator."""
+
+    def __init__(self, backend, query):
+        self.backend = backend
+        self.query = query
+
+    def count(self):
+        return self.backend.count(self.query)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop = index.start or 0, index.stop
+            return hydrate(self.backend.fetch(self.query, start, stop - start))
+        return self[index:index + 1][0]
+
+
+class SqliteBackend:
+    def index_posts(self, posts):
+        self._replace([(post_rowid(post.pk), '', post.message) for post in posts])
+
+    def index_topics(self, topics):
+        self._replace([(topic_rowid(topic.pk), topic.subject, '') for topic in topics])
+
+    def remove_posts(self, pks):
+        self._delete([post_rowid(pk) for pk in pks])
+
+    def remove_topics(self, pks):
+        self._delete([topic_rowid(pk) for pk in pks])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+
+    def _delete(self, rowids):
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(rowid,) for rowid in rowids])
+
+    def _replace(self, rows):
+        self._delete([row[0] for row in rows])
+        with connection.cursor() as cursor:
+            cursor.executemany(f'INSERT INTO {FTS_TABLE} (rowid, subject, message) VALUES (%s, %s, %s)', rows)
+
+    @staticmethod
+    def match_expression(query):
+        # Quote every term so user input can never be parsed as FTS5 syntax.
+        return ' '.join(f'"{term}"*' for term in re.findall(r'\w+', query))
+
+    def count(self, query):
+        expression = self.match_expression(query)
+        if not expression:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [expression])
+            return cursor.fetchone()[0]
+
+    def fetch(self, query, offset, limit):
+        expression = self.match_expression(query)
+        if not expression:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid, snippet({FTS_TABLE}, -1, %s, %s, '…', 24) FROM {FTS_TABLE} "
+                f'WHERE {FTS_TABLE} MATCH %s ORDER BY bm25({FTS_TABLE}, 4.0, 1.0) LIMIT %s OFFSET %s',
+                [MARK_START, MARK_END, expression, limit, offset],
+            )
+            return [
+                SearchHit('post' if rowid % 2 == 0 else 'topic', rowid // 2, highlight(snippet))
+                for rowid, snippet in cursor.fetchall()
+            ]
+
+
+class DatabaseBackend:
+    """Unindexed fallback for databases without FTS5."""
+
+    def index_posts(self, posts):
+        pass
+
+    def index_topics(self, topics):
+        pass
+
+    def remove_posts(self, pks):
+        pass
+
+    def remove_topics(self, pks):
+        pass
+
+    def clear(self):
+        pass
+
+    def _querysets(self, query):
+        """Topics whose subject and posts whose message contain every term, as the index matches them."""
+        from .models import Post, Topic
+
+        terms = re.findall(r'\w+', query)
+        topics = Topic.objects.order_by('-last_updated', '-pk')
+        posts = Post.objects.order_by('-created_at', '-pk')
+        for term in terms:
+            topics = topics.filter(subject__icontains=term)
+            posts = posts.filter(message__icontains=term)
+        return (topics, posts) if terms else (topics.none(), posts.none())
+
+    def count(self, query):
+        topics, posts = self._querysets(query)
+        return topics.count() + posts.count()
+
+    def fetch(self, query, offset, limit):
+        # Subject matches rank first, as they do in the index.
+        topics, posts = self._querysets(query)
+        hits = [
+            SearchHit('topic', pk, subject)
+            for pk, subject in topics.values_list('pk', 'subject')[offset:offset + limit]
+        ]
+        if len(hits) < limit:
+            offset = max(offset - topics.count(), 0)
+            rows = posts.values_list('pk', 'message')[offset:offset + limit - len(hits)]
+            hits += [SearchHit('post', pk, Truncator(message).chars(200)) for pk, message in rows]
+        return hits
+
+
+_fts_available = None
+
+
+def get_backend():
+    global _fts_available
+    if _fts_available is None:
+        _fts_available = connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names()
+    return SqliteBackend() if _fts_available else DatabaseBackend()
+
+
+def search(query):
+    return SearchResults(get_backend(), query)
+
+
+def rebuild_index(batch_size=2000, log=None):
+    from .models import Post, Topic
+
+    log = log or (lambda message: None)
+    backend = get_backend()
+    with transaction.atomic():
+        backend.clear()
+        sources = (
+            (Topic.objects.only('subject'), backend.index_topics),
+            (Post.objects.only('message'), backend.index_posts),
+        )
+        for queryset, index in sources:
+            count = 0
+            batch = []
+            for obj in queryset.order_by('pk').iterator(chunk_size=batch_size):
+                batch.append(obj)
+                if len(batch) == batch_size:
+                    index(batch)
+                    count += len(batch)
+                    batch = []
+            index(batch)
+            count += len(batch)
+            log(f'Indexed {count} {queryset.model._meta.verbose_name_plural}.')
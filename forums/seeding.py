@@ -0,0 +1,85 @@
+"""
+Synthetic data for benchmarks and local development.
+
+Rows are written with ``bulk_create``, which skips the model signals, so the
+counters and the search index are rebuilt once at the end.
+"""
+import itertools
+import random
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from . import search
+from .models import Board, Post, Topic
+
+WORDS = (
+    'django python forum thread reply topic board query index cache database worker request '
+    'response template model view migration server deploy test page user post message search'
+).split()
+
+
+def sentence(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def seed(boards=5, topics=100, posts=1000, users=50, batch_size=1000, seed=0, log=None):
+    """
+    Create ``boards`` boards, ``topics`` topics spread over them, and ``posts``
+    posts spread over the topics. Every topic gets at least one post.
+    """
+    rng = random.Random(seed)
+    log = log or (lambda message: None)
+    user_model = get_user_model()
+    password = make_password('password')
+    prefix = f'seed{Board.objects.count()}'
+
+    with transaction.atomic():
+        created_users = user_model.objects.bulk_create(
+            [user_model(username=f'{prefix}-user{i}', email=f'{prefix}-user{i}@example.com', password=password)
+             for i in range(users)],
+            batch_size=batch_size,
+        )
+        log(f'Created {len(created_users)} users.')
+        created_boards = Board.objects.bulk_create(
+            [Board(name=f'{prefix}-board{i}'[:30], description=sentence(rng, 6)) for i in range(boards)],
+            batch_size=batch_size,
+        )
+        log(f'Created {len(created_boards)} boards.')
+
+        topic_ids = []
+        for batch_start in range(0, topics, batch_size):
+            batch = [
+                Topic(subject=sentence(rng, 5), board=rng.choice(created_boards), starter=rng.choice(created_users))
+                for _ in range(batch_start, min(batch_start + batch_size, topics))
+            ]
+            topic_ids.extend(topic.pk for topic in Topic.objects.bulk_create(batch))
+        log(f'Created {len(topic_ids)} topics.')
+
+        user_ids = [user.pk for user in created_users]
+        # The first len(topic_ids) posts open each topic, the rest are random replies.
+        targets = itertools.chain(topic_ids, (rng.choice(topic_ids) for _ in range(max(posts - len(topic_ids), 0))))
+        created = 0
+        while True:
+            batch = [
+                Post(message=sentence(rng, rng.randint(5, 60)), topic_id=topic_id, created_by_id=rng.choice(user_ids))
+                for topic_id in itertools.islice(targets, batch_size)
+            ]
+            if not batch:
+                break
+            for post in batch:
+                post.render_message()
+            Post.objects.bulk_create(batch)
+            created += len(batch)
+        log(f'Created {created} posts.')
+
+        Topic.objects.filter(pk__in=topic_ids).refresh_counters()
+        Board.objects.filter(pk__in=[board.pk for board in created_boards]).refresh_counters()
+        user_model.objects.filter(pk__in=user_ids).refresh_counters()
+        log('Rebuilt counters.')
+
+    search.rebuild_index(batch_size)
+    log('Rebuilt search index.')
+    return created_boards, created_users
+
@@ -0,0 +1,117 @@
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Case, Exists, F, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import caching, events, tasks
+from .models import Board, Post, Topic
+
+
+@receiver(post_save, sender=Topic)
+def topic_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        Board.objects.filter(pk=instance.board_id).update(topics_count=F('topics_count') + 1)
+
+
+@receiver(post_delete, sender=Topic)
+def topic_deleted(sender, instance, **kwargs):
+    Board.objects.filter(pk=instance.board_id).update(topics_count=F('topics_count') - 1)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if not created:
+        if instance.updated_by_id and instance.updated_at:
+            Topic.objects.filter(pk=instance.topic_id).update(
+                last_updated=Greatest('last_updated', Value(instance.updated_at)),
+                last_poster=instance.updated_by_id,
+            )
+        return
+    # The opening post of a topic is not a reply.
+    earlier_posts = Post.objects.filter(topic=instance.topic_id).exclude(pk=instance.pk)
+    Topic.objects.filter(pk=instance.topic_id).update(
+        reply_count=Case(When(Exists(earlier_posts), then=F('reply_count') + 1), default=0),
+        last_updated=Greatest('last_updated', Value(instance.created_at)),
+        last_poster=instance.created_by_id,
+    )
+    Board.objects.filter(topics=instance.topic_id).update(
+        posts_count=F('posts_count') + 1,
+        last_post=instance,
+    )
+    get_user_model().objects.filter(pk=instance.created_by_id).update(post_count=F('post_count') + 1)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    boards = Board.objects.filter(topics=instance.topic_id)
+    boards.update(posts_count=F('posts_count') - 1)
+    get_user_model().objects.filter(pk=instance.created_by_id).update(post_count=F('post_count') - 1)
+    latest_activity = Post.objects.filter(topic=instance.topic_id).order_by(
+        Coalesce('updated_at', 'created_at').desc(), '-pk',
+    )
+    Topic.objects.filter(pk=instance.topic_id).update(
+        reply_count=Case(When(reply_count__gt=0, then=F('reply_count') - 1), default=0),
+        last_poster=Subquery(latest_activity.values(user=Coalesce('updated_by', 'created_by'))[:1]),
+    )
+    # The collector nulls ``last_post`` before the row goes away, so pick the next latest post.
+    latest = Post.objects.filter(topic__board=boards.values('pk')[:1]).order_by('-created_at', '-pk')
+    boards.filter(Q(last_post=None) | Q(last_post=instance.pk)).update(
+        last_post=Subquery(latest.values('pk')[:1]),
+    )
+
+
+@receiver(post_save, sender=Topic)
+def index_topic(sender, instance, raw=False, **kwargs):
+    if not raw:
+        tasks.index_topic.delay(instance.pk, dedup_key=f'search:topic:{instance.pk}')
+
+
+@receiver(post_delete, sender=Topic)
+def unindex_topic(sender, instance, **kwargs):
+    tasks.index_topic.delay(instance.pk, dedup_key=f'search:topic:{instance.pk}')
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, raw=False, **kwargs):
+    if not raw:
+        tasks.index_post.delay(instance.pk, dedup_key=f'search:post:{instance.pk}')
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    tasks.index_post.delay(instance.pk, dedup_key=f'search:post:{instance.pk}')
+
+
+@receiver(post_save, sender=Board)
+@receiver(post_delete, sender=Board)
+def invalidate_board_pages(sender, instance, **kwargs):
+    transaction.on_commit(partial(caching.bump, 'boards', f'board:{instance.pk}'))
+
+
+@receiver(post_save, sender=Topic)
+@receiver(post_delete, sender=Topic)
+def invalidate_topic_pages(sender, instance, **kwargs):
+    transaction.on_commit(partial(caching.bump, 'boards', f'board:{instance.board_id}', f'topic:{instance.pk}'))
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_pages(sender, instance, **kwargs):
+    if Post.topic.is_cached(instance):
+        board_id = instance.topic.board_id
+    else:
+        board_id = Topic.objects.filter(pk=instance.topic_id).values_list('board_id', flat=True).first()
+    # Bumped before the commit, a request in between would cache the old rows under the new version.
+    transaction.on_commit(partial(caching.bump, 'boards', f'board:{board_id}', f'topic:{instance.topic_id}'))
+
+
+@receiver(post_save, sender=Post)
+def publish_post(sender, instance, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(partial(events.publish, instance.topic_id))
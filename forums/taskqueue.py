@@ -0,0 +1,230 @@
+"""
+A small background task queue for side effects that don't need to finish
+before the response is sent, such as search indexing and outgoing mail.
+
+Functions decorated with ``@task`` get a ``delay()`` method that hands the call
+to the configured broker:
+
+* ``ImmediateBroker`` runs it straight away, like a plain function call. This
+  is the default, so development and tests see the effects immediately.
+* ``DatabaseBroker`` writes a ``Task`` row in the caller's transaction, so a
+  job is queued if and only if the write that caused it commits. Run
+  ``manage.py run_tasks`` to work through the rows. Failed jobs are retried
+  with exponential backoff until ``MAX_ATTEMPTS`` is reached.
+* ``LocalBroker`` runs it on a background thread of the same process after
+  the transaction commits. Queued jobs are lost when the process exits.
+
+Arguments must be JSON serializable. Calls with the same ``dedup_key`` are
+collapsed into one while a job with that key is still waiting to run.
+"""
+import json
+import logging
+import queue
+import threading
+import traceback
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules, import_string
+
+DEFAULTS = {
+    'BROKER': 'forums.taskqueue.ImmediateBroker',
+    'MAX_ATTEMPTS': 5,
+    'RETRY_DELAY': 10,  # seconds before the first retry, doubled after each failure
+    'STALE_AFTER': 600,  # running jobs older than this belong to a dead worker
+}
+
+logger = logging.getLogger(__name__)
+
+registry = {}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'FORUMS_TASKS', {})}
+
+
+def get_broker():
+    return import_string(get_config()['BROKER'])()
+
+
+def task(func):
+    name = f'{func.__module__}.{func.__name__}'
+    registry[name] = func
+    func.task_name = name
+    func.delay = partial(enqueue, name)
+    return func
+
+
+def enqueue(name, *args, dedup_key=None):
+    # Round-trip through JSON so every broker sees the arguments a worker would.
+    args = json.loads(json.dumps(args))
+    return get_broker().enqueue(name, args, dedup_key)
+
+
+def run_task(name, args):
+    if name not in registry:
+        autodiscover_modules('tasks')
+    try:
+        func = registry[name]
+    except KeyError:
+        raise LookupError(f'Unknown task: {name!r}') from None
+    return func(*args)
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=get_config()['RETRY_DELAY'] * 2 ** (attempts - 1))
+
+
+class ImmediateBroker:
+    def enqueue(self, name, args, dedup_key=None):
+        run_task(name, args)
+
+
+class DatabaseBroker:
+    def enqueue(self, name, args, dedup_key=None):
+        from .models import Task
+
+        job = Task(name=name, args=args, dedup_key=dedup_key, run_after=timezone.now())
+        if dedup_key is None:
+            job.save()
+            return job
+        try:
+            with transaction.atomic():
+                job.save()
+        except IntegrityError:
+            return None  # the same job is already waiting
+        return job
+
+
+class LocalBroker:
+    queue = queue.Queue()
+    waiting = set()
+    lock = threading.Lock()
+    thread = None
+
+    def enqueue(self, name, args, dedup_key=None):
+        transaction.on_commit(partial(self.put, name, args, dedup_key))
+
+    @classmethod
+    def put(cls, name, args, dedup_key, attempt=1):
+        with cls.lock:
+            if dedup_key is not None:
+                if dedup_key in cls.waiting:
+                    return
+                cls.waiting.add(dedup_key)
+            if cls.thread is None or not cls.thread.is_alive():
+                cls.thread = threading.Thread(target=cls.work, name='forums-tasks', daemon=True)
+                cls.thread.start()
+        cls.queue.put((name, args, dedup_key, attempt))
+
+    @classmethod
+    def work(cls):
+        while True:
+            name, args, dedup_key, attempt = cls.queue.get()
+            with cls.lock:
+                cls.waiting.discard(dedup_key)
+            close_old_connections()
+            try:
+                run_task(name, args)
+            except Exception:
+                if attempt >= get_config()['MAX_ATTEMPTS']:
+                    logger.exception('Task %s%r failed after %d attempts', name, tuple(args), attempt)
+                else:
+                    logger.warning('Task %s%r failed, retrying', name, tuple(args), exc_info=True)
+                    timer = threading.Timer(
+                        retry_delay(attempt).total_seconds(), cls.put, (name, args, dedup_key, attempt + 1)
+                    )
+                    timer.daemon = True
+                    timer.start()
+            finally:
+                close_old_connections()
+                cls.queue.task_done()
+
+    @classmethod
+    def join(cls):
+        cls.queue.join()
+
+
+def requeue_stale(now=None):
+    """Put back jobs claimed by a worker that died before finishing them."""
+    from .models import Task
+
+    now = now or timezone.now()
+    stale = Task.objects.filter(
+        status=Task.RUNNING,
+        claimed_at__lt=now - timedelta(seconds=get_config()['STALE_AFTER']),
+    )
+    waiting = Task.objects.filter(status=Task.PENDING, dedup_key__isnull=False).values('dedup_key')
+    stale.filter(dedup_key__in=waiting).delete()
+    return stale.update(status=Task.PENDING, claimed_at=None)
+
+
+def claim(limit=10, now=None):
+    """
+    Mark up to ``limit`` due jobs as running and return them. The conditional
+    update makes sure that two workers never get the same job.
+    """
+    from .models import Task
+
+    now = now or timezone.now()
+    due = (
+        Task.objects.filter(status=Task.PENDING, run_after__lte=now)
+        .order_by('run_after', 'pk')
+        .values_list('pk', flat=True)[:limit]
+    )
+    claimed = [
+        pk for pk in list(due)
+        if Task.objects.filter(pk=pk, status=Task.PENDING).update(
+            status=Task.RUNNING, claimed_at=now, attempts=F('attempts') + 1,
+        )
+    ]
+    return list(Task.objects.filter(pk__in=claimed).order_by('run_after', 'pk'))
+
+
+def execute(job):
+    try:
+        with transaction.atomic():
+            run_task(job.name, job.args)
+    except Exception:
+        fail(job, traceback.format_exc())
+        return False
+    job.delete()
+    return True
+
+
+def fail(job, error):
+    from .models import Task
+
+    job.last_error = error
+    job.claimed_at = None
+    if job.attempts >= get_config()['MAX_ATTEMPTS']:
+        job.status = Task.FAILED
+        logger.error('Task %s failed after %d attempts:\n%s', job, job.attempts, error)
+    else:
+        job.status = Task.PENDING
+        job.run_after = timezone.now() + retry_delay(job.attempts)
+        logger.warning('Task %s failed, retrying at %s:\n%s', job, job.run_after, error)
+    try:
+        with transaction.atomic():
+            job.save(update_fields=['status', 'run_after', 'claimed_at', 'last_error'])
+    except IntegrityError:
+        job.delete()  # a newer copy of the job is already waiting
+
+
+def run_pending(batch_size=10):
+    """Run every job that is due and return the number that succeeded and failed."""
+    requeue_stale()
+    succeeded = failed = 0
+    while True:
+        jobs = claim(batch_size)
+        if not jobs:
+            return succeeded, failed
+        for job in jobs:
+            if execute(job):
+                succeeded += 1
+            else:
+                failed += 1
@@ -0,0 +1,21 @@
+from . import search
+from .models import Post, Topic
+from .taskqueue import task
+
+
+@task
+def index_post(post_id):
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None:
+        search.get_backend().remove_posts([post_id])
+    else:
+        search.get_backend().index_posts([post])
+
+
+@task
+def index_topic(topic_id):
+    topic = Topic.objects.filter(pk=topic_id).first()
+    if topic is None:
+        search.get_backend().remove_topics([topic_id])
+    else:
+        search.get_backend().index_topics([topic])
@@ -0,0 +1,230 @@
+"""
+Streaming JSONL export and import of users, boards, topics and posts,
+including the archived ones.
+
+Every line is one object in the shape of Django's ``jsonl`` serializer:
+``{"model": "forums.post", "pk": 1, "fields": {...}}``. Objects are written
+in dependency order (users, boards, topics, posts, archived topics, archived
+posts) so an import never sees a reference before its target. Archived posts
+are written with their message decompressed.
+
+The import remaps primary keys by adding a per-model offset (the table's
+highest pk when the import started) instead of keeping an id map in memory.
+Archived topics and posts keep sharing ids with live ones, so they are
+remapped with the topic and post offsets, taken over both tables.
+Users and boards whose username or name already exist are reused; only those
+few aliases are stored. The offsets, aliases and the number of lines
+committed are kept in a state file next to the input, so an interrupted
+import continues with ``--resume``. Because new pks are deterministic,
+rows that were committed but not yet recorded are skipped on resume.
+"""
+import datetime
+import itertools
+import json
+import os
+import zlib
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.color import no_style
+from django.db import connection, router, transaction
+from django.db.models import Max
+
+from . import caching, search
+from .models import ArchivedPost, ArchivedTopic, Board, Post, Topic
+
+USER_FIELDS = ('username', 'email', 'password', 'first_name', 'last_name', 'is_active', 'date_joined')
+BOARD_FIELDS = ('name', 'description')
+TOPIC_FIELDS = ('subject', 'last_updated', 'board', 'starter', 'views')
+POST_FIELDS = ('message', 'topic', 'created_at', 'updated_at', 'created_by', 'updated_by')
+ARCHIVED_TOPIC_FIELDS = (
+    'subject', 'last_updated', 'board_id', 'starter_id', 'views', 'reply_count', 'archived_at',
+)
+ARCHIVED_POST_FIELDS = ('message', 'topic', 'created_at', 'updated_at', 'created_by_id', 'updated_by_id')
+
+# Archived rows refer to boards and users by plain integer ids.
+ID_REFERENCES = {
+    'board_id': 'forums.board',
+    'starter_id': settings.AUTH_USER_MODEL.lower(),
+    'created_by_id': settings.AUTH_USER_MODEL.lower(),
+    'updated_by_id': settings.AUTH_USER_MODEL.lower(),
+}
+# Archived topics and posts keep the ids they had in the hot tables.
+PK_SPACES = {
+    'forums.archivedtopic': 'forums.topic',
+    'forums.archivedpost': 'forums.post',
+}
+
+
+def sources():
+    return (
+        (get_user_model(), USER_FIELDS),
+        (Board, BOARD_FIELDS),
+        (Topic, TOPIC_FIELDS),
+        (Post, POST_FIELDS),
+        (ArchivedTopic, ARCHIVED_TOPIC_FIELDS),
+        (ArchivedPost, ARCHIVED_POST_FIELDS),
+    )
+
+
+def column(model, name):
+    if model is ArchivedPost and name == 'message':
+        return 'message_zlib'
+    return model._meta.get_field(name).attname
+
+
+def json_default(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def export(stream, chunk_size=2000):
+    """Write every object to ``stream`` one line at a time and return the number of lines."""
+    lines = 0
+    for model, fields in sources():
+        label = model._meta.label_lower
+        columns = [column(model, name) for name in fields]
+        for row in model.objects.order_by('pk').values_list('pk', *columns).iterator(chunk_size=chunk_size):
+            record = {'model': label, 'pk': row[0], 'fields': dict(zip(fields, row[1:]))}
+            if model is ArchivedPost:
+                record['fields']['message'] = zlib.decompress(record['fields']['message']).decode()
+            stream.write(json.dumps(record, default=json_default) + '\n')
+            lines += 1
+    return lines
+
+
+@contextmanager
+def keep_timestamps():
+    """Let bulk_create store the exported timestamps instead of stamping them with now()."""
+    fields = [field for model in (Topic, Post, ArchivedTopic) for field in model._meta.concrete_fields
+              if getattr(field, 'auto_now_add', False)]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Importer:
+    def __init__(self, path, batch_size=1000, resume=False, log=None):
+        self.path = path
+        self.batch_size = batch_size
+        self.state_path = f'{path}.import-state.json'
+        self.log = log or (lambda message: None)
+        self.models = {model._meta.label_lower: (model, fields) for model, fields in sources()}
+        if resume:
+            with open(self.state_path) as state:
+                self.state = json.load(state)
+        elif os.path.exists(self.state_path):
+            raise FileExistsError(f'{self.state_path} exists; resume the import or delete it.')
+        else:
+            top = {label: model.objects.aggregate(top=Max('pk'))['top'] or 0
+                   for label, (model, fields) in self.models.items()}
+            for archived_label, label in PK_SPACES.items():
+                top[label] = max(top[label], top.pop(archived_label))
+            self.state = {
+                'line': 0,
+                'offsets': top,
+                'aliases': {label: {} for label in top},
+            }
+            self.save_state()
+
+    def save_state(self):
+        temporary = f'{self.state_path}.tmp'
+        with open(temporary, 'w') as state:
+            json.dump(self.state, state)
+        os.replace(temporary, self.state_path)
+
+    def new_pk(self, label, old_pk):
+        label = PK_SPACES.get(label, label)
+        return self.state['aliases'][label].get(str(old_pk), old_pk + self.state['offsets'][label])
+
+    def chunks(self):
+        with open(self.path) as source:
+            records = (json.loads(line) for line in itertools.islice(source, self.state['line'], None))
+            for label, group in itertools.groupby(records, key=lambda record: record['model']):
+                while True:
+                    chunk = list(itertools.islice(group, self.batch_size))
+                    if not chunk:
+                        break
+                    yield label, chunk
+
+    def build(self, label, record):
+        model, fields = self.models[label]
+        values = {}
+        for name in fields:
+            value = record['fields'].get(name)
+            if name == 'message' and model is ArchivedPost:
+                values[name] = value
+                continue
+            field = model._meta.get_field(name)
+            if field.is_relation and value is not None:
+                value = self.new_pk(field.related_model._meta.label_lower, value)
+            elif name in ID_REFERENCES and value is not None:
+                value = self.new_pk(ID_REFERENCES[name], value)
+            values[field.attname] = value
+        return model(pk=self.new_pk(label, record['pk']), **values)
+
+    def reuse_existing(self, label, chunk):
+        """Map users and boards that already exist by natural key onto the existing rows."""
+        model, fields = self.models[label]
+        key = {'users.customuser': 'username', 'forums.board': 'name'}.get(label)
+        if key is None:
+            return chunk
+        names = [record['fields'][key] for record in chunk]
+        existing = dict(model.objects.filter(**{f'{key}__in': names}).values_list(key, 'pk'))
+        remaining = []
+        for record in chunk:
+            name = record['fields'][key]
+            if name in existing and existing[name] != self.new_pk(label, record['pk']):
+                self.state['aliases'][label][str(record['pk'])] = existing[name]
+            else:
+                remaining.append(record)
+        return remaining
+
+    def import_chunk(self, label, chunk):
+        model, fields = self.models[label]
+        chunk = self.reuse_existing(label, chunk)
+        objects = [self.build(label, record) for record in chunk]
+        # Rows committed before an interruption already exist under their deterministic pk.
+        present = set(model.objects.filter(pk__in=[obj.pk for obj in objects]).values_list('pk', flat=True))
+        objects = [obj for obj in objects if obj.pk not in present]
+        if model is Post:
+            for obj in objects:
+                obj.render_message()
+        with keep_timestamps():
+            model.objects.bulk_create(objects)
+        if model is Topic:
+            search.get_backend().index_topics(objects)
+        elif model is Post:
+            search.get_backend().index_posts(objects)
+            Topic.objects.filter(pk__in={obj.topic_id for obj in objects}).refresh_counters()
+        return len(objects)
+
+    def run(self):
+        imported = 0
+        for label, chunk in self.chunks():
+            with transaction.atomic(using=router.db_for_write(self.models[label][0])):
+                imported += self.import_chunk(label, chunk)
+            self.state['line'] += len(chunk)
+            self.save_state()
+            self.log(f'{self.state["line"]} lines read, {imported} objects imported.')
+        self.finish()
+        return imported
+
+    def finish(self):
+        with transaction.atomic():
+            Board.objects.all().refresh_counters()
+            get_user_model().objects.all().refresh_counters()
+        models = [model for model, fields in self.models.values()]
+        statements = connection.ops.sequence_reset_sql(no_style(), models)
+        if statements:
+            with connection.cursor() as cursor:
+                for statement in statements:
+                    cursor.execute(statement)
+        caching.bump('boards', *(f'board:{pk}' for pk in Board.objects.values_list('pk', flat=True)))
+        os.remove(self.state_path)
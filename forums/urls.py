@@ -4,9 +4,13 @@ from . import views
 
 urlpatterns = [
     path('', views.BoardListView.as_view(), name='home'),
+    path('search/', views.SearchView.as_view(), name='search'),
     path('boards/<int:pk>/', views.TopicListView.as_view(), name='board_topics'),
     path('boards/<int:pk>/new/', views.new_topic, name='new_topic'),
+    path('boards/<int:pk>/mark-read/', views.mark_board_read, name='mark_board_read'),
     path('boards/<int:pk>/<int:topic_pk>/', views.PostListView.as_view(), name='topic_posts'),
+    path('boards/<int:pk>/<int:topic_pk>/events/', views.topic_events, name='topic_events'),
+    path('boards/<int:pk>/<int:topic_pk>/export/', views.export_topic, name='export_topic'),
     path('boards/<int:pk>/<int:topic_pk>/reply/', views.reply_topic, name='reply_topic'),
     path('boards/<int:pk>/<int:topic_pk>/<int:post_pk>/edit', views.PostUpdateView.as_view(),
          name='edit_post'),
@@ -0,0 +1,155 @@
+"""
+Buffered topic view counts.
+
+Page views are added to a backend and written to the database in batches as
+``views = views + n`` updates, so rendering a topic never has to write to it.
+"""
+import atexit
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils.module_loading import import_string
+
+DEFAULTS = {
+    'BACKEND': 'forums.view_counter.MemoryBackend',
+    'OPTIONS': {},
+    'FLUSH_INTERVAL': 30,
+}
+
+
+class MemoryBackend:
+    """Keeps pending views in the memory of the current process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = Counter()
+
+    def add(self, topic_id, count=1):
+        with self._lock:
+            self._counts[topic_id] += count
+
+    def pending(self, topic_ids):
+        with self._lock:
+            return {pk: self._counts[pk] for pk in topic_ids if pk in self._counts}
+
+    def drain(self):
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+        return counts
+
+
+class SpoolBackend:
+    """
+    Appends views to a spool file shared by every worker on the host, so they
+    survive a worker restart and can be flushed by the ``flush_views`` command.
+    Pending counts are read back from the spool, so they include the views of
+    every worker and drop out as soon as any of them flushes.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(settings.BASE_DIR, 'var', 'views.spool')
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+    def add(self, topic_id, count=1):
+        line = f'{topic_id} {count}\n'.encode()
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+
+    def read(self, path):
+        counts = Counter()
+        try:
+            with open(path) as spool:
+                for line in spool:
+                    topic_id, count = line.split()
+                    counts[int(topic_id)] += int(count)
+        except FileNotFoundError:
+            pass
+        return counts
+
+    def pending(self, topic_ids):
+        counts = self.read(self.path)
+        return {pk: counts[pk] for pk in topic_ids if pk in counts}
+
+    def drain(self):
+        claimed = f'{self.path}.{os.getpid()}.{time.time_ns()}'
+        try:
+            os.rename(self.path, claimed)
+        except FileNotFoundError:
+            return Counter()
+        counts = self.read(claimed)
+        os.remove(claimed)
+        return counts
+
+
+_backend = None
+_backend_lock = threading.Lock()
+_last_flush = time.monotonic()
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'FORUMS_VIEW_COUNTER', {})}
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                config = get_config()
+                _backend = import_string(config['BACKEND'])(**config['OPTIONS'])
+                atexit.register(flush_views)
+    return _backend
+
+
+def flush_due():
+    global _last_flush
+    interval = get_config()['FLUSH_INTERVAL']
+    if interval is not None and time.monotonic() - _last_flush >= interval:
+        _last_flush = time.monotonic()
+        return True
+    return False
+
+
+def record_view(topic_id):
+    get_backend().add(topic_id)
+    if flush_due():
+        flush_views()
+
+
+async def arecord_view(topic_id):
+    get_backend().add(topic_id)
+    if flush_due():
+        await sync_to_async(flush_views)()
+
+
+def pending_views(topic_ids):
+    return get_backend().pending(topic_ids)
+
+
+def flush_views():
+    """Write the buffered views to the database and return how many topics were updated."""
+    from .models import Topic
+
+    backend = get_backend()
+    counts = backend.drain()
+    by_count = defaultdict(list)
+    for topic_id, count in counts.items():
+        by_count[count].append(topic_id)
+    try:
+        with transaction.atomic():
+            for count, topic_ids in by_count.items():
+                Topic.objects.filter(pk__in=topic_ids).update(views=F('views') + count)
+    except Exception:
+        for topic_id, count in counts.items():
+            backend.add(topic_id, count)
+        raise
+    return len(counts)
@@ -1,19 +1,50 @@
+import itertools
+
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.db.models import Count
+from django.db import transaction
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
+from django.template.loader import get_template
 from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.utils.text import slugify
+from django.views.decorators.http import require_POST
 from django.views.generic import ListView, UpdateView
 
 from .forms import NewTopicForm, PostForm
-from .models import Board, Post, Topic
+from . import archive, events, reading, search
+from .caching import AnonymousCacheMixin, ConditionalGetMixin
+from .models import ArchivedTopic, Board, Post, Topic
+from .pagination import KeysetPaginationMixin
+from .ratelimit import ratelimit
+from .view_counter import pending_views, record_view
 
 
-class BoardListView(ListView):
+class BoardListView(ConditionalGetMixin, AnonymousCacheMixin, ListView):
     template_name = 'home.html'
-    model = Board
+    queryset = Board.objects.select_related('last_post__created_by')
+
+    def get_cache_scopes(self):
+        return ['boards']
+
 
+class SearchView(ListView):
+    template_name = 'search.html'
+    context_object_name = 'results'
+    paginate_by = 10
 
+    def get_queryset(self):
+        self.query = self.request.GET.get('q', '').strip()
+        return search.search(self.query)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['query'] = self.query
+        return context
+
+
+@method_decorator(ratelimit('edit_post'), name='dispatch')
 class PostUpdateView(LoginRequiredMixin, UpdateView):
     model = Post
     fields = ('message',)
@@ -29,47 +60,128 @@ class PostUpdateView(LoginRequiredMixin, UpdateView):
         post = form.save(commit=False)
         post.updated_by = self.request.user
         post.updated_at = timezone.now()
-        post.save()
-        return redirect('topic_posts', pk=post.topic.board.pk, topic_pk=post.topic.pk)
+        with transaction.atomic():
+            post.save()
+        return redirect('topic_posts', pk=post.topic.board_id, topic_pk=post.topic_id)
 
 
-class TopicListView(ListView):
+class TopicListView(ConditionalGetMixin, AnonymousCacheMixin, KeysetPaginationMixin, ListView):
     model = Topic
     context_object_name = 'topics'
     template_name = 'board_topics.html'
     paginate_by = 5
+    keyset_ordering = ('-last_updated', '-id')
+
+    def get_cache_scopes(self):
+        scopes = [f'board:{self.kwargs["pk"]}']
+        if self.request.user.is_authenticated:
+            scopes.append(reading.reads_scope(self.request.user))
+        return scopes
 
     def get_queryset(self):
         self.board = get_object_or_404(Board, pk=self.kwargs.get('pk'))
-        queryset = self.board.topics.order_by('-last_updated').annotate(replies=Count('posts') - 1)
+        queryset = self.board.topics.select_related('starter', 'last_poster').order_by(*self.keyset_ordering)
         return queryset
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        pending = pending_views([topic.pk for topic in context['topics']])
+        unread = reading.unread_counts(self.request.user, context['topics'])
+        for topic in context['topics']:
+            topic.views += pending.get(topic.pk, 0)
+            topic.unread = unread.get(topic.pk, 0)
         context['board'] = self.board
         return context
 
 
-class PostListView(ListView):
+class PostListView(ConditionalGetMixin, AnonymousCacheMixin, KeysetPaginationMixin, ListView):
     model = Post
     context_object_name = 'posts'
     template_name = 'topic_posts.html'
     paginate_by = 2
+    keyset_ordering = ('created_at', 'id')
+
+    def get_cache_scopes(self):
+        return [f'topic:{self.kwargs["topic_pk"]}']
+
+    def get(self, request, *args, **kwargs):
+        try:
+            return self.get_live(request, *args, **kwargs)
+        except Http404:
+            if not ArchivedTopic.objects.filter(pk=self.kwargs['topic_pk']).exists():
+                raise
+        return ArchivedPostListView.as_view()(request, *args, **kwargs)
+
+    def get_live(self, request, *args, **kwargs):
+        if 'unread' in request.GET and request.user.is_authenticated:
+            return self.unread_redirect()
+        response = super().get(request, *args, **kwargs)
+        # Cached renders skip get_context_data, so the view is counted here.
+        if response.status_code == 200:
+            record_view(self.kwargs['topic_pk'])
+            if request.user.is_authenticated:
+                self.mark_page_read(response.context_data['posts'])
+        return response
+
+    def unread_redirect(self):
+        return redirect(reading.first_unread_url(self.get_topic(), self.paginate_by, self.keyset_ordering))
+
+    def mark_page_read(self, posts):
+        if posts:
+            reading.mark_read(self.request.user, self.topic, max(post.pk for post in posts))
+
+    def get_topic(self):
+        self.topic = get_object_or_404(
+            reading.with_read_state(Topic.objects.select_related('board'), self.request.user),
+            board__pk=self.kwargs.get('pk'),
+            pk=self.kwargs.get('topic_pk'),
+        )
+        return self.topic
 
     def get_queryset(self):
-        self.topic = get_object_or_404(Topic, board__pk=self.kwargs.get('pk'), pk=self.kwargs.get('topic_pk'))
-        queryset = self.topic.posts.order_by('created_at')
+        queryset = self.get_topic().posts.select_related('created_by').order_by(*self.keyset_ordering)
         return queryset
 
     def get_context_data(self, **kwargs):
-        self.topic.views += 1
-        self.topic.save()
         context = super().get_context_data(**kwargs)
         context['topic'] = self.topic
+        context['events_cursor'] = events.initial_cursor(context['page_obj'])
         return context
 
 
+class ArchivedPostListView(ConditionalGetMixin, AnonymousCacheMixin, KeysetPaginationMixin, ListView):
+    """Read-only thread page for a topic in ``forums.archive``."""
+    context_object_name = 'posts'
+    template_name = 'archived_topic_posts.html'
+    paginate_by = PostListView.paginate_by
+    keyset_ordering = PostListView.keyset_ordering
+
+    def get_cache_scopes(self):
+        return [f'topic:{self.kwargs["topic_pk"]}']
+
+    def get_queryset(self):
+        self.topic = archive.get_topic(self.kwargs['pk'], self.kwargs['topic_pk'])
+        if self.topic is None:
+            raise Http404('No archived topic matches the given query.')
+        return self.topic.posts.order_by(*self.keyset_ordering)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        archive.attach_authors(context['posts'])
+        context['topic'] = self.topic
+        return context
+
+
+@login_required
+@require_POST
+def mark_board_read(request, pk):
+    board = get_object_or_404(Board, pk=pk)
+    reading.mark_board_read(request.user, board)
+    return redirect('board_topics', pk=pk)
+
+
 @login_required
+@ratelimit('new_topic')
 def new_topic(request, pk):
     board = get_object_or_404(Board, pk=pk)
     user = request.user
@@ -77,15 +189,16 @@ def new_topic(request, pk):
     if request.method == 'POST':
         form = NewTopicForm(request.POST)
         if form.is_valid():
-            topic = form.save(commit=False)
-            topic.board = board
-            topic.starter = user
-            topic.save()
-            Post.objects.create(
-                message=form.cleaned_data.get('message'),
-                topic=topic,
-                created_by=user,
-            )
+            with transaction.atomic():
+                topic = form.save(commit=False)
+                topic.board = board
+                topic.starter = user
+                topic.save()
+                Post.objects.create(
+                    message=form.cleaned_data.get('message'),
+                    topic=topic,
+                    created_by=user,
+                )
             return redirect('topic_posts', pk=pk, topic_pk=topic.pk)
     else:
         form = NewTopicForm()
@@ -95,18 +208,73 @@ def new_topic(request, pk):
 
 
 @login_required
+@ratelimit('reply_topic')
 def reply_topic(request, pk, topic_pk):
-    topic = get_object_or_404(Topic, board__pk=pk, pk=topic_pk)
-    posts = topic.posts.all()
+    topic = get_object_or_404(Topic.objects.select_related('board'), board__pk=pk, pk=topic_pk)
+    posts = topic.posts.select_related('created_by')
     if request.method == 'POST':
         form = PostForm(request.POST)
         if form.is_valid():
             post = form.save(commit=False)
             post.topic = topic
             post.created_by = request.user
-            post.save()
+            with transaction.atomic():
+                post.save()
             return redirect('topic_posts', pk=pk, topic_pk=topic_pk)
     else:
         form = PostForm()
     context = {'topic': topic, 'posts': posts, 'form': form}
     return render(request, 'reply_topic.html', context)
+
+
+def topic_events(request, pk, topic_pk):
+    if not events.enabled():
+        raise Http404('Live updates are off.')
+    topic = get_object_or_404(Topic.objects.select_related('board'), board__pk=pk, pk=topic_pk)
+    cursor = events.resume_cursor(request) or events.latest_cursor(topic)
+    return events.event_stream_response(events.stream(request, topic, cursor))
+
+
+EXPORT_CONTENT_TYPES = {
+    'html': 'text/html',
+    'text': 'text/plain',
+    'markdown': 'text/markdown',
+}
+
+
+def render_topic_export(topic, posts, export_format):
+    if export_format == 'html':
+        post_template = get_template('export/topic_post.html')
+        # The topic started with its first post; last_updated moves with every reply.
+        posts = iter(posts)
+        first = next(posts, None)
+        started_at = first.created_at if first else None
+        yield get_template('export/topic_start.html').render({'topic': topic, 'started_at': started_at})
+        for post in itertools.chain([first] if first else [], posts):
+            yield post_template.render({'post': post})
+        yield get_template('export/topic_end.html').render({'topic': topic})
+    elif export_format == 'markdown':
+        yield f'# {topic.subject}\n\n_{topic.board.name}, started by {topic.starter.username}_\n'
+        for post in posts:
+            yield f'\n---\n\n**{post.created_by.username}** at {post.created_at:%Y-%m-%d %H:%M}\n\n{post.message}\n'
+    else:
+        yield f'{topic.subject}\n{"=" * len(topic.subject)}\n'
+        for post in posts:
+            yield f'\n{post.created_by.username} at {post.created_at:%Y-%m-%d %H:%M}\n\n{post.message}\n'
+
+
+def export_topic(request, pk, topic_pk):
+    topic = get_object_or_404(Topic.objects.select_related('board', 'starter'), board__pk=pk, pk=topic_pk)
+    export_format = request.GET.get('format', 'html')
+    if export_format not in EXPORT_CONTENT_TYPES:
+        raise Http404('Unknown export format.')
+    posts = topic.posts.select_related('created_by').order_by('created_at', 'id').iterator(chunk_size=500)
+    response = StreamingHttpResponse(
+        render_topic_export(topic, posts, export_format),
+        content_type=f'{EXPORT_CONTENT_TYPES[export_format]}; charset=utf-8',
+    )
+    if export_format != 'html':
+        extension = 'md' if export_format == 'markdown' else 'txt'
+        filename = f'{slugify(topic.subject) or topic.pk}.{extension}'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
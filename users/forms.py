@@ -1,6 +1,8 @@
 from django import forms
-from django.contrib.auth.forms import UserCreationForm, UserChangeForm
+from django.contrib.auth.forms import PasswordResetForm, UserCreationForm, UserChangeForm
+from django.template import loader
 
+from . import tasks
 from .models import CustomUser
 
 
@@ -16,3 +18,16 @@ class CustomUserChangeForm(UserChangeForm):
     class Meta:
         model = CustomUser
         fields = UserChangeForm.Meta.fields
+
+
+class QueuedPasswordResetForm(PasswordResetForm):
+    """Renders the reset email during the request but leaves sending it to the task queue."""
+
+    def send_mail(self, subject_template_name, email_template_name, context, from_email,
+                  to_email, html_email_template_name=None):
+        subject = ''.join(loader.render_to_string(subject_template_name, context).splitlines())
+        body = loader.render_to_string(email_template_name, context)
+        html_body = None
+        if html_email_template_name is not None:
+            html_body = loader.render_to_string(html_email_template_name, context)
+        tasks.send_mail.delay(subject, body, from_email, [to_email], html_body)
@@ -0,0 +1,29 @@
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_post_count(apps, schema_editor):
+    CustomUser = apps.get_model('users', 'CustomUser')
+    Post = apps.get_model('forums', 'Post')
+    posts = Post.objects.filter(created_by=OuterRef('pk'))
+    CustomUser.objects.update(post_count=Coalesce(Subquery(
+        posts.order_by().values('created_by').annotate(count=Count('pk')).values('count')
+    ), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+        ('forums', '0004_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='post_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_post_count, migrations.RunPython.noop),
+    ]
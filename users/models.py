@@ -1,9 +1,27 @@
+from django.apps import apps
 from django.contrib.auth.models import AbstractUser, UserManager
+from django.db import models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 
 
-class CustomUserManager(UserManager):
+class CustomUserQuerySet(models.QuerySet):
+    def refresh_counters(self):
+        from forums.archive import add_archived_counts
+
+        posts = apps.get_model('forums', 'Post').objects.filter(created_by=OuterRef('pk'))
+        count = self.update(post_count=Coalesce(Subquery(
+            posts.order_by().values('created_by').annotate(count=Count('pk')).values('count')
+        ), 0))
+        add_archived_counts(self)
+        return count
+
+
+class CustomUserManager(UserManager.from_queryset(CustomUserQuerySet)):
     pass
 
 
 class CustomUser(AbstractUser):
+    post_count = models.PositiveIntegerField(default=0)
+
     objects = CustomUserManager()
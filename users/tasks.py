@@ -0,0 +1,11 @@
+from django.core.mail import EmailMultiAlternatives
+
+from forums.taskqueue import task
+
+
+@task
+def send_mail(subject, body, from_email, recipients, html_body=None):
+    message = EmailMultiAlternatives(subject, body, from_email, recipients)
+    if html_body:
+        message.attach_alternative(html_body, 'text/html')
+    message.send()
@@ -1,9 +1,12 @@
 from django.contrib.auth import get_user_model
 from django.contrib.auth.forms import PasswordResetForm
 from django.core import mail
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls import reverse
 
+from forums.models import Task
+from forums.taskqueue import run_pending
+
 from .forms import CustomUserCreationForm as UserCreationForm
 
 
@@ -159,3 +162,18 @@ class PasswordResetMailTests(TestCase):
 
     def test_email_to(self):
         self.assertEqual([self.email_id, ], self.email_text.to)
+
+
+@override_settings(FORUMS_TASKS={'BROKER': 'forums.taskqueue.DatabaseBroker'})
+class QueuedPasswordResetTests(TestCase):
+    def setUp(self):
+        get_user_model().objects.create_user(username='test', email='test@example.com', password='secret')
+        self.response = self.client.post(reverse('password_reset'), {'email': 'test@example.com'})
+
+    def test_email_is_sent_by_the_worker(self):
+        self.assertRedirects(self.response, reverse('password_reset_done'))
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(Task.objects.get().name, 'users.tasks.send_mail')
+        run_pending()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['test@example.com'])
@@ -2,6 +2,7 @@ from django.contrib.auth import views as auth_views
 from django.urls import path
 
 from . import views
+from .forms import QueuedPasswordResetForm
 
 urlpatterns = [
     path('signup/', views.signup, name='signup'),
@@ -10,6 +11,7 @@ urlpatterns = [
     path(
         'password_reset/',
         auth_views.PasswordResetView.as_view(
+            form_class=QueuedPasswordResetForm,
             template_name='password_reset.html',
             email_template_name='password_reset_email.html',
             subject_template_name='password_reset_subject.txt'
@@ -1,9 +1,12 @@
 from django.contrib.auth import login
 from django.shortcuts import render, redirect
 
+from forums.ratelimit import ratelimit
+
 from .forms import CustomUserCreationForm as UserCreationForm
 
 
+@ratelimit('signup')
 def signup(request):
     if request.method == 'POST':
         form = UserCreationForm(request.POST)